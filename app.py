@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, stream_with_context, g
 from flask_babel import Babel, gettext as _
 from flask_wtf.csrf import CSRFProtect
 from flask_cors import CORS
@@ -6,14 +6,24 @@ import logging
 from datetime import datetime
 from blockchain import Blockchain
 import uuid
-from market_data import MarketDataService
+from market_data import get_market_service, MAX_HISTORY_DAYS
+from price_refresher import get_price_refresher
+from price_analytics import get_price_analytics, RESOLUTIONS as ANALYTICS_RESOLUTIONS
 from farmer_profiles import FarmerProfileManager
 from procurement import procurement_bp
-from traceability import TraceabilitySystem
+from traceability import (TraceabilitySystem, QR_MODES, QR_MODE_ENCRYPTED, QR_FORMATS,
+                          QR_FORMAT_PNG, QR_FORMAT_PNG_1BIT, QR_FORMAT_SVG)
 from user_manager import UserManager
+from label_sheets import LabelSheetPDF, render_labels
+from http_caching import cached_json
+from compression import Compressor
 from werkzeug.security import generate_password_hash
 import re
 import os
+import json
+import threading
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import google.generativeai as genai
 
@@ -22,6 +32,7 @@ app.secret_key = 'your-very-secure-secret-key-change-in-production-123456789'  #
 babel = Babel(app)
 csrf = CSRFProtect(app)
 CORS(app)  # Enable CORS for all routes
+Compressor(app)  # gzip/brotli for large JSON and HTML, precompressed static assets
 
 # Load environment variables
 load_dotenv()
@@ -41,14 +52,38 @@ babel.localeselector = get_locale
 
 # Instantiate services
 blockchain = Blockchain()
-# market_service = MarketDataService()  # Initialize lazily to prevent startup API calls
+# Market service is shared and created lazily by get_market_service() to prevent startup API calls
 profile_manager = FarmerProfileManager()
 user_manager = UserManager()
 traceability_system = TraceabilitySystem()
 
-def get_market_service():
-    """Get market service instance (lazy initialization)"""
-    return MarketDataService()
+# Bulk QR verification (warehouse intake)
+MAX_BULK_SCANS = 500
+bulk_verify_executor = ThreadPoolExecutor(max_workers=8)
+
+# Printable label sheets
+MAX_LABELS_PER_SHEET = 10000
+
+# Days of price history per /price_history page
+PRICE_HISTORY_PAGE_SIZE = 366
+
+# Server-sent price stream: comment heartbeat interval and connection lifetime (clients reconnect with Last-Event-ID)
+PRICE_STREAM_HEARTBEAT = 20
+PRICE_STREAM_MAX_AGE = 300
+# Each open stream holds a server worker thread for up to PRICE_STREAM_MAX_AGE seconds, so open
+# streams are capped; clients over the cap get 503 and fall back to polling /market_prices
+MAX_PRICE_STREAMS = int(os.getenv('MAX_PRICE_STREAMS', 50))
+price_stream_slots = threading.BoundedSemaphore(MAX_PRICE_STREAMS)
+
+def price_context():
+    """Live price snapshot pinned for the current request"""
+    if 'price_context' not in g:
+        g.price_context = get_price_refresher().context()
+    return g.price_context
+
+def qr_server_timing(timings):
+    """Format QR pipeline stage timings as a Server-Timing header value"""
+    return ', '.join(f'qr-{stage.replace("_", "-")};dur={duration:.2f}' for stage, duration in timings.items())
 
 # Initialize test data on startup
 def initialize_test_data():
@@ -132,31 +167,162 @@ node_identifier = str(uuid.uuid4()).replace('-', '')
 def home():
     return render_template('index.html')
 
+def price_snapshot_version(**kwargs):
+    """ETag source for snapshot-backed routes; also starts revalidation of stale sources"""
+    refresher = get_price_refresher()
+    refresher.revalidate()
+    return refresher.snapshot().version
+
+def price_snapshot_time(**kwargs):
+    return get_price_refresher().snapshot().created_at
+
+def chain_tip(**kwargs):
+    """ETag source for routes derived from the blockchain: changes with every new block"""
+    return f"{len(blockchain.chain)}:{blockchain.hash(blockchain.last_block)}"
+
+def chain_tip_time(**kwargs):
+    return datetime.fromtimestamp(blockchain.last_block['timestamp'])
+
 @app.route('/market_prices')
+@cached_json(max_age=30, version=price_snapshot_version, last_modified=price_snapshot_time)
 def market_prices():
-    # Get live market prices with real-time data
-    market_data = get_market_service().get_live_prices()
+    # Latest background-refreshed price snapshot, with its age and staleness
+    market_data = get_price_refresher().current()
     return jsonify(market_data)
 
+def sse_event(event, data, event_id=None):
+    """Format one server-sent event"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/market_prices/stream')
+def market_prices_stream():
+    # Push price changes as deltas whenever the background snapshot updates
+    if not price_stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open price streams; poll /market_prices instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(PRICE_STREAM_HEARTBEAT)
+        return response
+
+    refresher = get_price_refresher()
+    last_version = request.headers.get('Last-Event-ID', type=int)
+
+    def changes_since(version, snapshot):
+        """Delta event from version to snapshot, or a full snapshot event if the history no longer covers it"""
+        delta = refresher.delta_since(version, snapshot)
+        if delta is None:
+            return sse_event('snapshot', refresher.current(snapshot), snapshot.version)
+        if delta['changed'] or delta['removed']:
+            return sse_event('delta', delta, snapshot.version)
+        # Nothing visible changed: only advance the client's Last-Event-ID
+        return f'id: {snapshot.version}\n\n'
+
+    def events():
+        yield 'retry: 5000\n\n'
+        snapshot = refresher.snapshot()
+        if last_version != snapshot.version:
+            yield changes_since(last_version, snapshot)
+
+        version = snapshot.version
+        closes_at = monotonic() + PRICE_STREAM_MAX_AGE
+        while monotonic() < closes_at:
+            snapshot = refresher.wait_for_update(version, PRICE_STREAM_HEARTBEAT)
+            if snapshot is None:
+                yield ': keep-alive\n\n'
+                continue
+
+            # Versions published while we were writing are merged into one delta
+            yield changes_since(version, snapshot)
+            version = snapshot.version
+
+    response = app.response_class(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(price_stream_slots.release)
+    return response
+
 @app.route('/market_intelligence')
 def market_intelligence():
     # Get market intelligence and recommendations
-    intelligence = get_market_service().get_market_intelligence()
+    intelligence = get_price_refresher().market_intelligence()
     return jsonify(intelligence)
 
 @app.route('/price_history/<crop>')
+@cached_json(max_age=300)
 def price_history(crop):
-    # Get historical price data for a specific crop
-    days = request.args.get('days', 30, type=int)
+    # Get historical price data for a specific crop, paginated for long ranges
+    days = max(1, min(request.args.get('days', 30, type=int), MAX_HISTORY_DAYS))
+    page = max(1, request.args.get('page', 1, type=int))
+    page_size = max(1, min(request.args.get('page_size', PRICE_HISTORY_PAGE_SIZE, type=int), PRICE_HISTORY_PAGE_SIZE))
+
     history = get_market_service().get_price_history(crop, days)
-    return jsonify({'crop': crop, 'history': history})
+    # Recorded history is padded with simulated days before recording started
+    data_types = {record['data_type'] for record in history}
+    pages = (len(history) + page_size - 1) // page_size
+    # Page 1 holds the most recent days
+    end = len(history) - (page - 1) * page_size
+    return jsonify({
+        'crop': crop,
+        'data_type': data_types.pop() if len(data_types) == 1 else ('mixed' if data_types else 'recorded'),
+        'days': days,
+        'page': page,
+        'pages': pages,
+        'history': history[max(0, end - page_size):max(0, end)]
+    })
+
+@app.route('/api/price_analytics/<variety>')
+def price_analytics(variety):
+    # OHLC candles, moving averages and volatility per market over recorded prices
+    resolution = request.args.get('resolution', 'daily')
+    if resolution not in ANALYTICS_RESOLUTIONS:
+        return jsonify({'error': f'Unsupported resolution: {resolution}'}), 400
+
+    days = request.args.get('days', 90, type=int)
+    market = request.args.get('market') or None
+    return jsonify(get_price_analytics().candles(variety, resolution, days, market))
 
 @app.route('/regional_prices/<region>')
+@cached_json(max_age=300, version=price_snapshot_version, last_modified=price_snapshot_time)
 def regional_prices(region):
-    # Get region-specific pricing
-    prices = get_market_service().get_regional_prices(region)
+    # Region-specific pricing from the regional matrix of the current price snapshot
+    matrix = price_context().regional
+    prices = get_market_service().get_regional_prices(region, matrix)
+    if prices is None:
+        return jsonify({'error': f'Unknown region: {region}', 'regions': matrix.markets}), 404
     return jsonify({'region': region, 'prices': prices})
 
+@app.route('/api/regional_prices')
+@cached_json(max_age=300, version=price_snapshot_version, last_modified=price_snapshot_time)
+def regional_prices_multi():
+    # Several regions at once (?regions=Hyderabad,Warangal); all markets when not given
+    matrix = price_context().regional
+    names = [name.strip() for name in request.args.get('regions', '').split(',') if name.strip()]
+    return jsonify({
+        'regions': matrix.regions(names or matrix.markets),
+        'markets': matrix.markets,
+        'created_at': matrix.created_at.isoformat()
+    })
+
+@app.route('/api/regional_prices/spreads')
+@cached_json(max_age=300, version=price_snapshot_version, last_modified=price_snapshot_time)
+def regional_spreads():
+    # Cross-market spread per variety and the best buy-low/sell-high opportunities
+    matrix = price_context().regional
+    variety = request.args.get('variety') or None
+    min_margin = request.args.get('min_margin', 0.0, type=float)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    return jsonify({
+        'spreads': matrix.spreads(),
+        'arbitrage': matrix.arbitrage(variety, min_margin, limit),
+        'transfer_cost_pct': matrix.transfer_cost_pct,
+        'created_at': matrix.created_at.isoformat()
+    })
+
 @app.route('/api/agmarknet')
 def agmarknet_data():
     # Get Agmarknet data
@@ -193,17 +359,29 @@ def all_sources_data():
     commodity = request.args.get('commodity', 'turmeric')
     state = request.args.get('state', 'Telangana')
 
-    data = {
+    sources = {
         'agmarknet': get_market_service().get_agmarknet_data(state, commodity),
         'commodityonline': get_market_service().get_commodityonline_data(commodity),
         'ncdex': get_market_service().get_ncdex_data(commodity),
-        'datagovin': get_market_service().get_datagovin_data(state, commodity),
+        'datagovin': get_market_service().get_datagovin_data(state, commodity)
+    }
+    data = {
+        **sources,
+        # One consensus per variety and market across the four sources
+        'reconciled': get_market_service().reconciler.reconcile(
+            {name: blob.get('prices', {}) for name, blob in sources.items()}
+        ),
         'last_updated': datetime.now().isoformat(),
         'commodity': commodity,
         'state': state
     }
     return jsonify(data)
 
+@app.route('/api/market_sources/health')
+def market_sources_health():
+    # Circuit breaker state per market data source
+    return jsonify(get_market_service().get_source_health())
+
 @app.route('/farmer/profile', methods=['GET', 'POST'])
 def farmer_profile():
     if 'user' not in session:
@@ -238,17 +416,17 @@ def impact_dashboard():
     # Admin endpoint for overall impact metrics with live market data
     summary = profile_manager.get_impact_summary()
 
-    # Get live market data for real-time display
-    live_market_data = get_market_service().get_live_prices()
-    market_intelligence = get_market_service().get_market_intelligence()
+    # Live market data for real-time display; prices and intelligence come from the same snapshot
+    prices = price_context()
+    live_market_data = prices.live_data
+    market_intelligence = prices.intelligence()
 
-    # Get price history for charts
-    price_history = {}
-    for crop in ['alleppey', 'erode', 'nizamabad']:
-        try:
-            price_history[crop] = get_market_service().get_price_history(crop, days=30)
-        except:
-            price_history[crop] = []
+    # Get price history for charts (generated together and cached for the day)
+    chart_crops = ['alleppey', 'erode', 'nizamabad']
+    try:
+        price_history = get_market_service().get_price_histories(chart_crops, days=30)
+    except Exception:
+        price_history = {crop: [] for crop in chart_crops}
 
     return render_template('impact_dashboard.html',
                          summary=summary,
@@ -270,6 +448,7 @@ def join_cooperative():
     return jsonify({'success': False, 'message': 'Already a member or cooperative not found'})
 
 @app.route('/supply_chain/trace/<batch_id>')
+@cached_json(max_age=60, version=chain_tip, last_modified=chain_tip_time)
 def trace_supply_chain(batch_id):
     """Trace a product through the supply chain using batch ID"""
     # Search through blockchain for transactions with this batch ID
@@ -315,36 +494,150 @@ def trace_by_qr(qr_code):
         'trace': traced_transactions
     })
 
-@app.route('/generate_qr/<batch_id>')
-def generate_qr_code(batch_id):
-    """Generate QR code for a specific batch"""
-    # Find batch data in blockchain
-    batch_data = None
+def find_batch_data(batch_id):
+    """
+    Look up a batch on the blockchain for QR generation
+    :return: copy of the batch's supply chain data with block details, or None
+    """
     for block in blockchain.chain:
         for transaction in block['transactions']:
             if (transaction.get('supply_chain', {}).get('batch_id') == batch_id or
                 batch_id in transaction.get('supply_chain', {}).get('traceability_qr', '')):
-                batch_data = transaction['supply_chain']
+                # Copy so the mined transaction itself is never modified
+                batch_data = dict(transaction['supply_chain'])
                 batch_data.update({
                     'transaction_hash': blockchain.hash(block),
                     'block_index': block['index'],
                     'timestamp': transaction['timestamp']
                 })
-                break
-        if batch_data:
-            break
+                return batch_data
+    return None
+
+def index_batch_records():
+    """Map every batch ID on the chain to the first (block, transaction) that records it"""
+    records = {}
+    for block in blockchain.chain:
+        for transaction in block['transactions']:
+            batch_id = transaction.get('supply_chain', {}).get('batch_id')
+            if batch_id and batch_id not in records:
+                records[batch_id] = (block, transaction)
+    return records
+
+@app.route('/generate_qr/<batch_id>')
+def generate_qr_code(batch_id):
+    """Generate QR code for a specific batch"""
+    # Find batch data in blockchain
+    batch_data = find_batch_data(batch_id)
 
     if not batch_data:
         return jsonify({'error': 'Batch not found'}), 404
 
+    mode = request.args.get('mode', QR_MODE_ENCRYPTED)
+    if mode not in QR_MODES:
+        return jsonify({'error': f'Unsupported QR mode: {mode}'}), 400
+
+    fmt = request.args.get('format', QR_FORMAT_PNG)
+    if fmt not in QR_FORMATS:
+        return jsonify({'error': f'Unsupported QR format: {fmt}'}), 400
+
     # Generate QR code
-    qr_data_url = traceability_system.generate_qr_data_url(batch_data, include_logo=True)
+    timings = {}
+    qr_data_url = traceability_system.generate_qr_data_url(batch_data, include_logo=True, mode=mode, fmt=fmt,
+                                                           timings=timings)
 
-    return jsonify({
+    response = jsonify({
         'qr_code': qr_data_url,
         'batch_data': batch_data,
-        'verification_url': f'/verify_qr/{batch_id}'
+        'verification_url': f'/verify_qr/{batch_id}',
+        'image_urls': {
+            'png': url_for('qr_image', batch_id=batch_id, ext='png', mode=mode),
+            'svg': url_for('qr_image', batch_id=batch_id, ext='svg', mode=mode)
+        }
     })
+    response.headers['Server-Timing'] = qr_server_timing(timings)
+    return response
+
+@app.route('/qr/<batch_id>.<ext>')
+def qr_image(batch_id, ext):
+    """Serve a batch QR code as raw image bytes: 1-bit PNG or SVG"""
+    fmt = {'png': QR_FORMAT_PNG_1BIT, 'svg': QR_FORMAT_SVG}.get(ext)
+    if not fmt:
+        return jsonify({'error': f'Unsupported image type: {ext}'}), 404
+
+    mode = request.args.get('mode', QR_MODE_ENCRYPTED)
+    if mode not in QR_MODES:
+        return jsonify({'error': f'Unsupported QR mode: {mode}'}), 400
+
+    batch_data = find_batch_data(batch_id)
+    if not batch_data:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    include_logo = request.args.get('logo', '1') != '0'
+    timings = {}
+    data, content_type = traceability_system.render_qr(batch_data, include_logo=include_logo, mode=mode, fmt=fmt,
+                                                       timings=timings)
+
+    response = app.response_class(data, mimetype=content_type)
+    response.headers['Server-Timing'] = qr_server_timing(timings)
+    return response
+
+@app.route('/labels/sheet', methods=['GET', 'POST'])
+def label_sheet():
+    """Stream a printable PDF sheet of branded batch QR labels"""
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+
+    batch_ids = params.get('batch_ids') or []
+    if isinstance(batch_ids, str):
+        batch_ids = [batch_id for batch_id in batch_ids.split(',') if batch_id]
+
+    mode = params.get('mode', QR_MODE_ENCRYPTED)
+    if mode not in QR_MODES:
+        return jsonify({'error': f'Unsupported QR mode: {mode}'}), 400
+
+    try:
+        sheet = LabelSheetPDF(
+            page_size=params.get('page_size', 'A4'),
+            columns=int(params.get('columns', 3)),
+            rows=int(params.get('rows', 4)),
+            margin=float(params.get('margin', 36)),
+            gutter=float(params.get('gutter', 12))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    records = index_batch_records()
+    if not batch_ids:
+        # Default to every batch on the chain
+        batch_ids = list(records)
+
+    missing = [batch_id for batch_id in batch_ids if batch_id not in records]
+    if missing:
+        return jsonify({'error': 'Batch not found', 'missing': missing[:50]}), 404
+
+    if len(batch_ids) > MAX_LABELS_PER_SHEET:
+        return jsonify({'error': f'At most {MAX_LABELS_PER_SHEET} labels per sheet'}), 413
+
+    def batches():
+        # Build each label's data only when the PDF writer asks for it
+        block_hashes = {}
+        for batch_id in batch_ids:
+            block, transaction = records[batch_id]
+            if block['index'] not in block_hashes:
+                block_hashes[block['index']] = blockchain.hash(block)
+            batch_data = dict(transaction['supply_chain'])
+            batch_data.update({
+                'transaction_hash': block_hashes[block['index']],
+                'block_index': block['index'],
+                'timestamp': transaction['timestamp']
+            })
+            yield batch_data
+
+    labels = render_labels(traceability_system, batches(), mode)
+    return app.response_class(
+        stream_with_context(sheet.stream(labels)),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': 'attachment; filename="batch_labels.pdf"'}
+    )
 
 @app.route('/display_qr/<batch_id>')
 def display_qr_page(batch_id):
@@ -390,6 +683,60 @@ def verify_qr_code():
         'data': decrypted_data
     })
 
+@app.route('/api/traceability/public_key')
+def traceability_public_key():
+    """Public key for verifying signed QR codes offline"""
+    response = jsonify(traceability_system.public_key_info())
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+@app.route('/api/verify_qr/bulk', methods=['POST'])
+def verify_qr_bulk():
+    """Verify many scanned QR codes in one request (warehouse intake)"""
+    data = request.get_json(silent=True) or {}
+    scans = data.get('scans')
+
+    if not isinstance(scans, list) or not scans:
+        return jsonify({'error': 'No scans provided'}), 400
+
+    if len(scans) > MAX_BULK_SCANS:
+        return jsonify({'error': f'At most {MAX_BULK_SCANS} scans per request'}), 413
+
+    # Decrypt each distinct scan once, concurrently
+    unique_scans = list(dict.fromkeys(scan for scan in scans if isinstance(scan, str) and scan))
+    decrypted = dict(zip(unique_scans, bulk_verify_executor.map(traceability_system.verify_traceability, unique_scans)))
+
+    # One pass over the chain serves every scan in the request
+    batch_blocks = {batch_id: block for batch_id, (block, _) in index_batch_records().items()}
+
+    block_hashes = {}
+    results = []
+    verified_count = 0
+
+    for scan in scans:
+        decrypted_data = decrypted.get(scan) if isinstance(scan, str) else None
+        if not decrypted_data:
+            results.append({'verified': False, 'error': 'Invalid or corrupted QR code'})
+            continue
+
+        decrypted_data = dict(decrypted_data)
+        block = batch_blocks.get(decrypted_data.get('batch_id'))
+        if block:
+            if block['index'] not in block_hashes:
+                block_hashes[block['index']] = blockchain.hash(block)
+            decrypted_data['blockchain_verified'] = True
+            decrypted_data['block_index'] = block['index']
+            decrypted_data['transaction_hash'] = block_hashes[block['index']]
+            verified_count += 1
+
+        results.append({'verified': block is not None, 'data': decrypted_data})
+
+    return jsonify({
+        'results': results,
+        'total': len(scans),
+        'verified': verified_count
+    })
+
 @app.route('/create_batch_qr', methods=['POST'])
 def create_batch_qr():
     """Create a new batch with QR code"""
@@ -398,6 +745,10 @@ def create_batch_qr():
 
     data = request.get_json()
 
+    mode = data.get('qr_mode', QR_MODE_ENCRYPTED)
+    if mode not in QR_MODES:
+        return jsonify({'error': f'Unsupported QR mode: {mode}'}), 400
+
     # Generate unique batch ID
     batch_id = f"BATCH_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
@@ -419,7 +770,8 @@ def create_batch_qr():
     }
 
     # Generate QR code
-    qr_data_url = traceability_system.generate_qr_data_url(batch_data, include_logo=True)
+    timings = {}
+    qr_data_url = traceability_system.generate_qr_data_url(batch_data, include_logo=True, mode=mode, timings=timings)
 
     # Create blockchain transaction
     supply_chain_data = batch_data.copy()
@@ -432,13 +784,15 @@ def create_batch_qr():
         supply_chain_data=supply_chain_data
     )
 
-    return jsonify({
+    response = jsonify({
         'success': True,
         'batch_id': batch_id,
         'qr_code': qr_data_url,
         'batch_data': batch_data,
         'blockchain_index': index
     })
+    response.headers['Server-Timing'] = qr_server_timing(timings)
+    return response
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -460,6 +814,7 @@ def chat():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/quality_verification/<batch_id>')
+@cached_json(max_age=60, version=chain_tip, last_modified=chain_tip_time)
 def quality_verification(batch_id):
     """Get quality verification data for a batch"""
     # Search for quality certifications in the supply chain
@@ -566,7 +921,7 @@ def new_transaction():
             'buyer_type': values.get('buyer_type', 'direct'),
             'trade_type': values.get('trade_type', 'direct'),
             'quality_grade': values.get('quality_grade', 'standard'),
-            'market_price': get_market_service().get_live_prices()['prices'].get(values['crop_type'], {}).get('price', 0)
+            'market_price': price_context().get_price(values['crop_type'])
         })
 
     response = {
@@ -686,6 +1041,13 @@ def profile():
     user = user_manager.get_user_by_id(session['user_id'])
     return render_template('profile.html', user=user)
 
+@app.route('/sw.js')
+def service_worker():
+    """Serve the service worker from the root so it can control every page"""
+    response = app.send_static_file('js/sw.js')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/favicon.ico')
 def favicon():
     """Serve favicon"""
@@ -713,6 +1075,10 @@ csrf.exempt(chat)
 
 # Exempt QR verification API from CSRF protection
 csrf.exempt(verify_qr_code)
+csrf.exempt(verify_qr_bulk)
+
+# Exempt label sheet API (JSON POST) from CSRF protection
+csrf.exempt(label_sheet)
 
 # Exempt transactions API from CSRF protection for testing
 csrf.exempt(new_transaction)
@@ -0,0 +1,397 @@
+"""
+Backfill the price store from historical Agmarknet / data.gov.in price dumps.
+
+Dumps are streamed in chunks with pandas, so memory stays bounded by the chunk
+size. Each row becomes part of a daily bar per (variety, market, day), with
+varieties normalized by market_data.map_turmeric_variety. Rows are stored as
+parts of their day's bar and the bar is rebuilt from all of its parts; a row
+with the same variety, market, day and price as one already stored is dropped.
+A day split across chunks (or across an interrupted and a resumed run) therefore
+ends up as one complete bar, and loading the same rows again, even from a copy
+of the file, changes nothing. Progress is checkpointed per file in the same
+transaction as each chunk's rows; after a crash the run resumes at the first
+unfinished chunk, and a finished file is skipped. CSV checkpoints hold the byte
+offset after the last loaded record, so skipped bad lines and quoted fields
+spanning several lines don't shift the resume point.
+
+Usage: python backfill_prices.py DUMP [DUMP ...] [--source agmarknet] [--chunksize 50000]
+                                 [--db prices.db] [--price-unit quintal|kg] [--commodity turmeric]
+Supported dumps: .csv, .jsonl (one record per line) and .json (an array of records,
+or an object with a "records" array as returned by data.gov.in), optionally gzipped.
+"""
+import argparse
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta
+from itertools import islice
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from market_data import map_turmeric_variety
+from price_store import PriceStore
+
+# Normalized dump column -> field; Agmarknet exports and data.gov.in ('Modal_x0020_Price') use different names
+COLUMN_ALIASES = {
+    'market': ['market', 'market_name', 'apmc', 'mandi'],
+    'commodity': ['commodity', 'commodity_name'],
+    'variety': ['variety', 'variety_name'],
+    'date': ['arrival_date', 'price_date', 'reported_date', 'date'],
+    'modal_price': ['modal_price', 'modal_price_rs_quintal', 'modal_price_rs_kg', 'price'],
+    'min_price': ['min_price', 'min_price_rs_quintal', 'min_price_rs_kg'],
+    'max_price': ['max_price', 'max_price_rs_quintal', 'max_price_rs_kg'],
+    'volume': ['arrivals', 'arrivals_tonnes', 'arrival_quantity', 'quantity']
+}
+
+# Dumps quote per quintal (100 kg); the store holds prices per kg like the live sources
+PRICE_UNITS = {'quintal': 100.0, 'kg': 1.0}
+
+# Date formats seen in the dumps, tried in order (each one vectorized); anything else is parsed day-first
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d-%b-%Y', '%d %b %Y', '%Y-%m-%dT%H:%M:%S']
+
+JSON_READ_SIZE = 1 << 20
+
+def normalize_column(name: str) -> str:
+    """'Modal Price (Rs./Quintal)' / 'Modal_x0020_Price' -> 'modal_price_rs_quintal' / 'modal_price'"""
+    name = str(name).replace('_x0020_', ' ').strip().lower()
+    return re.sub(r'[^a-z0-9]+', '_', name).strip('_')
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Dump dates as 'YYYY-MM-DD' strings (missing where unparseable)"""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for date_format in DATE_FORMATS:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=date_format, errors='coerce')
+    missing = parsed.isna() & values.notna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(values[missing], dayfirst=True, errors='coerce', format='mixed')
+    return parsed.dt.strftime('%Y-%m-%d')
+
+def _open_binary(path: str):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+def iter_csv_chunks(path: str, chunksize: int, offset: int = 0) -> Iterator[tuple]:
+    """
+    CSV records in chunks of at most chunksize, each with the byte offset just after it
+    Records are split on physical lines, joining lines while a quoted field is open, so the
+    offsets are exact and a later call can resume from one with seek()
+    :param offset: byte offset to start at (0 for the first record after the header)
+    :return: iterator of (DataFrame of string columns, records in the chunk, end offset)
+    """
+    with _open_binary(path) as f:
+        header = f.readline()
+        if offset:
+            f.seek(offset)
+        lines, records, record_open = [], 0, False
+        while True:
+            line = f.readline()
+            if line:
+                lines.append(line)
+                # An odd number of quotes toggles whether the record continues on the next line
+                if line.count(b'"') % 2:
+                    record_open = not record_open
+                if not record_open and line.strip():
+                    records += 1
+            if records and (records == chunksize or not line):
+                text = (header + b''.join(lines)).decode('utf-8-sig')
+                frame = pd.read_csv(io.StringIO(text), dtype=str, on_bad_lines='warn')
+                yield frame, records, f.tell()
+                lines, records = [], 0
+            if not line:
+                return
+
+def _open_text(path: str):
+    return gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')
+
+def _dump_format(path: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    for suffix in ('.csv', '.jsonl', '.json'):
+        if name.endswith(suffix):
+            return suffix[1:]
+    raise ValueError(f"Unsupported dump type: {path}")
+
+def iter_jsonl_records(path: str) -> Iterator[Dict]:
+    with _open_text(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_json_records(path: str) -> Iterator[Dict]:
+    """
+    Records of a JSON array dump (top-level, or the "records" array of an object)
+    decoded one at a time, so the file is never held in memory whole
+    """
+    decoder = json.JSONDecoder()
+    with _open_text(path) as f:
+        buffer = f.read(JSON_READ_SIZE)
+        start = buffer.find('"records"')
+        start = buffer.find('[', start if start >= 0 else 0)
+        if start < 0:
+            raise ValueError(f"No records array found in {path}")
+        position = start + 1
+
+        while True:
+            # Skip separators, topping up the buffer as needed
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer):
+                    break
+                more = f.read(JSON_READ_SIZE)
+                if not more:
+                    return
+                buffer, position = more, 0
+            if buffer[position] == ']':
+                return
+
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                    break
+                except json.JSONDecodeError:
+                    more = f.read(JSON_READ_SIZE)
+                    if not more:
+                        raise
+                    buffer, position = buffer[position:] + more, 0
+            yield record
+            buffer, position = buffer[end:], 0
+
+class PriceBackfill:
+    """
+    Streams price dumps into a PriceStore as daily bars, resumably
+    """
+
+    def __init__(self, store: PriceStore, source: str = 'agmarknet', chunksize: int = 50000,
+                 price_unit: str = 'quintal', commodity: Optional[str] = 'turmeric'):
+        """
+        :param store: PriceStore the bars are inserted into
+        :param source: source key the bars are recorded under
+        :param chunksize: dump rows per chunk (bounds memory use)
+        :param price_unit: unit of the dump's prices, 'quintal' or 'kg'
+        :param commodity: keep only rows whose commodity contains this (all rows when None)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.source = source
+        self.chunksize = chunksize
+        self.price_divisor = PRICE_UNITS[price_unit]
+        self.commodity = commodity
+        self._variety_keys = {}
+        self.init_checkpoints()
+
+    def init_checkpoints(self):
+        with sqlite3.connect(self.store.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    rows_done INTEGER NOT NULL,
+                    offset INTEGER NOT NULL DEFAULT 0,
+                    bars_inserted INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(backfill_checkpoints)')]
+            if 'offset' not in columns:
+                # Checkpoints written before CSV resumes used byte offsets
+                conn.execute('ALTER TABLE backfill_checkpoints ADD COLUMN offset INTEGER NOT NULL DEFAULT 0')
+            conn.commit()
+
+    def _checkpoint(self, path: str, stat) -> Dict:
+        """Progress of a previous run over this exact file; a changed file starts over"""
+        with sqlite3.connect(self.store.db_path) as conn:
+            row = conn.execute('''SELECT size, mtime, rows_done, offset, bars_inserted, completed
+                                  FROM backfill_checkpoints WHERE path = ?''', (path,)).fetchone()
+        if row and (row[0], row[1]) == (stat.st_size, stat.st_mtime):
+            if row[2] and not row[3] and not row[5] and _dump_format(path) == 'csv':
+                # A CSV checkpoint without a byte offset can't be resumed exactly
+                self.logger.warning(f"{path} has a checkpoint from an older version; starting it over")
+            else:
+                return {'rows_done': row[2], 'offset': row[3], 'bars_inserted': row[4], 'completed': bool(row[5])}
+        elif row:
+            # Rows it already loaded are stored parts and are dropped again
+            self.logger.warning(f"{path} changed since the last run; starting it over")
+        return {'rows_done': 0, 'offset': 0, 'bars_inserted': 0, 'completed': False}
+
+    def backfill(self, path: str) -> Dict:
+        """
+        Load one dump, resuming after the last checkpointed chunk
+        :return: rows read, bars written (inserted or merged), elapsed seconds and rows per second for this run
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        checkpoint = self._checkpoint(path, stat)
+        if checkpoint['completed']:
+            self.logger.info(f"{path} already backfilled, skipping")
+            return {'path': path, 'rows': 0, 'bars': 0, 'seconds': 0.0, 'rows_per_second': 0.0, 'skipped': True}
+
+        rows_done, offset, bars_total = checkpoint['rows_done'], checkpoint['offset'], checkpoint['bars_inserted']
+        if rows_done:
+            self.logger.info(f"Resuming {path} after {rows_done} rows")
+
+        expired_before = (date.today() - timedelta(days=self.store.daily_retention_days)).isoformat()
+        started = perf_counter()
+        rows_read = bars_run = 0
+        for chunk, records, offset in self._chunks(path, rows_done, offset):
+            bars = self.daily_bars(chunk, expired_before)
+            rows_done += records
+            rows_read += records
+
+            with sqlite3.connect(self.store.db_path) as conn:
+                written = self.store.record_daily_bars(bars, conn)
+                self._save_checkpoint(conn, path, stat, rows_done, offset, bars_total + written, completed=False)
+                conn.commit()
+            bars_total += written
+            bars_run += written
+
+            elapsed = perf_counter() - started
+            self.logger.info(f"{os.path.basename(path)}: {rows_done} rows, {bars_total} bars written, "
+                             f"{rows_read / elapsed if elapsed else 0:,.0f} rows/s")
+
+        with sqlite3.connect(self.store.db_path) as conn:
+            self._save_checkpoint(conn, path, stat, rows_done, offset, bars_total, completed=True)
+            conn.commit()
+
+        elapsed = perf_counter() - started
+        return {
+            'path': path,
+            'rows': rows_read,
+            'bars': bars_run,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(rows_read / elapsed, 1) if elapsed else 0.0,
+            'skipped': False
+        }
+
+    @staticmethod
+    def _save_checkpoint(conn, path, stat, rows_done, offset, bars_written, completed):
+        conn.execute('''
+            INSERT OR REPLACE INTO backfill_checkpoints
+                (path, size, mtime, rows_done, offset, bars_inserted, completed, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (path, stat.st_size, stat.st_mtime, rows_done, offset, bars_written, int(completed),
+              datetime.now().isoformat()))
+
+    def _chunks(self, path: str, skip_records: int, offset: int) -> Iterator[tuple]:
+        """
+        Raw dump rows as DataFrames of at most chunksize records, after the ones already loaded
+        CSV dumps resume at a byte offset; JSON records are decoded deterministically, so
+        those resume by skipping skip_records records
+        :return: iterator of (DataFrame, records in it, resume offset after it)
+        """
+        dump_format = _dump_format(path)
+        if dump_format == 'csv':
+            yield from iter_csv_chunks(path, self.chunksize, offset)
+            return
+
+        records = iter_jsonl_records(path) if dump_format == 'jsonl' else iter_json_records(path)
+        records = islice(records, skip_records, None)
+        while True:
+            batch = list(islice(records, self.chunksize))
+            if not batch:
+                return
+            # Same string columns as a CSV chunk, with missing values left missing
+            frame = pd.DataFrame.from_records(batch)
+            yield frame.astype(str).where(frame.notna(), None), len(batch), 0
+
+    def daily_bars(self, chunk: pd.DataFrame, expired_before: Optional[str] = None) -> List[tuple]:
+        """
+        Normalize one chunk of dump rows into single-sample daily bars, which the store
+        folds into the bar of their day
+        Rows of other commodities, without a usable price or date, older than the store
+        keeps daily bars, or repeating a row's variety, market, day and price are dropped
+        :return: (source, variety, market, day, open, high, low, close, volume, samples) tuples
+        """
+        chunk = chunk.rename(columns=normalize_column)
+        columns = {field: next((alias for alias in aliases if alias in chunk.columns), None)
+                   for field, aliases in COLUMN_ALIASES.items()}
+        if columns['modal_price'] is None or columns['date'] is None:
+            raise ValueError(f"Dump has no price or date column: {list(chunk.columns)}")
+
+        if self.commodity and columns['commodity']:
+            chunk = chunk[chunk[columns['commodity']].str.contains(self.commodity, case=False, na=False)]
+        if chunk.empty:
+            return []
+
+        def numeric(field):
+            if columns[field] is None:
+                return pd.Series(float('nan'), index=chunk.index)
+            return pd.to_numeric(chunk[columns[field]].str.replace(',', '', regex=False), errors='coerce')
+
+        modal = numeric('modal_price') / self.price_divisor
+        frame = pd.DataFrame({
+            'variety': self._variety_column(chunk[columns['variety']] if columns['variety'] else None, chunk.index),
+            'market': chunk[columns['market']].fillna('').str.strip() if columns['market'] else '',
+            'day': parse_dates(chunk[columns['date']]),
+            'close': modal,
+            'low': (numeric('min_price') / self.price_divisor).fillna(modal),
+            'high': (numeric('max_price') / self.price_divisor).fillna(modal),
+            'volume': numeric('volume')
+        })
+        frame = frame[(frame['close'] > 0) & frame['day'].notna()]
+        if expired_before:
+            frame = frame[frame['day'] >= expired_before]
+        if frame.empty:
+            return []
+
+        # Dumps often repeat rows (overlapping exports, re-published days); prices are rounded
+        # first so the same row read from CSV and JSON matches
+        frame[['close', 'low', 'high']] = frame[['close', 'low', 'high']].round(2)
+        frame = frame.drop_duplicates(subset=['variety', 'market', 'day', 'close'])
+        frame['volume'] = frame['volume'].astype(object).where(frame['volume'].notna(), None)
+
+        return [
+            (self.source, row.variety, row.market, row.day, row.close, row.high, row.low, row.close, row.volume, 1)
+            for row in frame.itertuples(index=False)
+        ]
+
+    def _variety_column(self, varieties: Optional[pd.Series], index) -> pd.Series:
+        """Variety keys via map_turmeric_variety, called once per distinct raw name"""
+        if varieties is None:
+            return pd.Series('other', index=index)
+        varieties = varieties.fillna('').astype(str)
+        for name in varieties.unique():
+            if name not in self._variety_keys:
+                self._variety_keys[name] = map_turmeric_variety(name)
+        return varieties.map(self._variety_keys)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill the price store from historical mandi price dumps')
+    parser.add_argument('dumps', nargs='+', help='CSV, JSONL or JSON dump files (optionally .gz)')
+    parser.add_argument('--source', default='agmarknet', help='source key to record the bars under')
+    parser.add_argument('--chunksize', type=int, default=50000, help='rows per chunk')
+    parser.add_argument('--db', default=None, help='price store SQLite file (defaults to $PRICE_DB_PATH or prices.db)')
+    parser.add_argument('--price-unit', choices=sorted(PRICE_UNITS), default='quintal', help='unit of the dump prices')
+    parser.add_argument('--commodity', default='turmeric', help="keep rows whose commodity contains this ('' for all)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    backfill = PriceBackfill(PriceStore(args.db), source=args.source, chunksize=args.chunksize,
+                             price_unit=args.price_unit, commodity=args.commodity or None)
+
+    total_rows = total_bars = total_seconds = 0
+    for path in args.dumps:
+        result = backfill.backfill(path)
+        total_rows += result['rows']
+        total_bars += result['bars']
+        total_seconds += result['seconds']
+        if not result['skipped']:
+            print(f"{path}: {result['rows']} rows -> {result['bars']} daily bars written "
+                  f"in {result['seconds']:.1f}s ({result['rows_per_second']:,.0f} rows/s)")
+
+    rate = total_rows / total_seconds if total_seconds else 0
+    print(f"Total: {total_rows} rows, {total_bars} daily bars written, {rate:,.0f} rows/s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
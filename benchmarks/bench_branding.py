@@ -0,0 +1,60 @@
+"""
+Per-label branding render time: legacy (fresh canvas, fonts and static text per label)
+versus the pre-rendered branding templates in TraceabilitySystem.
+
+Usage: python benchmarks/bench_branding.py [labels]
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from key_store import TraceabilityKeyStore
+from traceability import TraceabilitySystem
+
+def legacy_branding(qr_image, batch_data):
+    """Branding as it was done before templates: everything redrawn per label"""
+    size = qr_image.size[0] + 100
+    branded_image = Image.new('RGB', (size, size), 'white')
+    branded_image.paste(qr_image, (50, 50))
+    draw = ImageDraw.Draw(branded_image)
+    try:
+        font = ImageFont.truetype("arial.ttf", 20)
+        small_font = ImageFont.truetype("arial.ttf", 12)
+    except OSError:
+        font = ImageFont.load_default()
+        small_font = ImageFont.load_default()
+    draw.text((size//2, 20), "AgriTech", fill="black", anchor="mm", font=font)
+    draw.text((size//2, size-30), f"Batch: {batch_data.get('batch_id', 'N/A')}", fill="black", anchor="mm", font=small_font)
+    draw.text((size//2, size-15), "Scan for Traceability", fill="black", anchor="mm", font=small_font)
+    return branded_image
+
+def time_per_label(brand, qr_image, labels):
+    start = perf_counter()
+    for i in range(labels):
+        brand(qr_image, {'batch_id': f'BATCH_{i:06d}'})
+    return (perf_counter() - start) * 1000 / labels
+
+def main():
+    labels = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with tempfile.TemporaryDirectory() as key_dir:
+        system = TraceabilitySystem(key_store=TraceabilityKeyStore(os.path.join(key_dir, 'keys.json')))
+        qr_image = system.build_qr({'batch_id': 'BATCH_BENCH', 'crop_type': 'turmeric', 'quantity': 100})['image']
+
+        # Warm the template and font caches outside the timed loop
+        system._add_branding(qr_image, {'batch_id': 'warmup'})
+
+        legacy_ms = time_per_label(legacy_branding, qr_image, labels)
+        template_ms = time_per_label(system._add_branding, qr_image, labels)
+
+    print(f"QR size: {qr_image.size[0]}px, labels: {labels}")
+    print(f"legacy branding:   {legacy_ms:.3f} ms/label")
+    print(f"template branding: {template_ms:.3f} ms/label")
+    print(f"speedup:           {legacy_ms / template_ms:.1f}x")
+
+if __name__ == '__main__':
+    main()
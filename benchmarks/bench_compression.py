@@ -0,0 +1,52 @@
+"""
+Bytes on the wire and compression CPU time for the largest responses, per
+encoding and level.
+
+Each route is fetched once uncompressed through the Flask test client, then the
+body is compressed repeatedly at every level to time it. Uses the test batches
+created by initialize_test_data.
+
+Usage: python benchmarks/bench_compression.py [repeats]
+"""
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from compression import brotli, compress
+
+ROUTES = ['/chain', '/api/all_sources', '/impact/dashboard', '/generate_qr/batch_001']
+
+LEVELS = [1, 6, 9]
+
+def fetch(client, route):
+    response = client.get(route, headers={'Accept-Encoding': 'identity'})
+    return response.status_code, response.get_data()
+
+def time_compress(data, encoding, level, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        compressed = compress(data, encoding, level)
+    return len(compressed), (perf_counter() - start) * 1000 / repeats
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+
+    with app.test_client() as client:
+        print(f"{'route':28} {'encoding':8} {'level':>5} {'bytes':>10} {'ratio':>7} {'cpu ms':>8}")
+        for route in ROUTES:
+            status, data = fetch(client, route)
+            if status != 200:
+                print(f"{route:28} HTTP {status}, skipped")
+                continue
+            print(f"{route:28} {'identity':8} {'-':>5} {len(data):>10} {1:>7.2f} {0:>8.3f}")
+            for encoding in encodings:
+                for level in LEVELS:
+                    size, cpu_ms = time_compress(data, encoding, level, repeats)
+                    print(f"{route:28} {encoding:8} {level:>5} {size:>10} {size / len(data):>7.2f} {cpu_ms:>8.3f}")
+
+if __name__ == '__main__':
+    main()
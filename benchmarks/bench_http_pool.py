@@ -0,0 +1,86 @@
+"""
+Latency saved per market refresh cycle by pooled keep-alive sessions,
+measured against a local stub HTTP server.
+
+The stub sleeps once per new connection to stand in for the TCP + TLS
+handshake to a remote API, so bare requests.get pays it on every call while
+a pooled session pays it once.
+
+Usage: python benchmarks/bench_http_pool.py [cycles] [handshake_ms]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from http_sessions import SessionPool
+
+# Calls made by one get_live_prices refresh: three Yahoo quotes and up to two data.gov.in resources
+REFRESH_PATHS = [
+    '/v7/finance/quote?symbols=GC=F',
+    '/v7/finance/quote?symbols=SI=F',
+    '/v7/finance/quote?symbols=CL=F',
+    '/resource/9ef84268-d588-465a-a308-a864a43d0070',
+    '/resource/9e0a4c4c-8b8c-4e8c-8c8c-8c8c8c8c8c8c'
+]
+
+BODY = json.dumps({'records': [{'commodity': 'Turmeric', 'modal_price': '280'}]}).encode()
+
+def make_handler(handshake_seconds):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def setup(self):
+            super().setup()
+            time.sleep(handshake_seconds)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def run_cycles(get, base_url, cycles):
+    start = perf_counter()
+    for _ in range(cycles):
+        for path in REFRESH_PATHS:
+            get(base_url + path, timeout=5).raise_for_status()
+    return (perf_counter() - start) * 1000 / cycles
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    handshake_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(handshake_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    pool = SessionPool()
+    session = pool.session('bench', {})
+
+    try:
+        bare_ms = run_cycles(requests.get, base_url, cycles)
+        pooled_ms = run_cycles(session.get, base_url, cycles)
+    finally:
+        pool.close()
+        server.shutdown()
+
+    print(f"{cycles} refresh cycles x {len(REFRESH_PATHS)} calls, simulated handshake {handshake_ms:.0f} ms")
+    print(f"bare requests.get: {bare_ms:8.2f} ms/cycle")
+    print(f"pooled session:    {pooled_ms:8.2f} ms/cycle")
+    print(f"saved:             {bare_ms - pooled_ms:8.2f} ms/cycle")
+
+if __name__ == '__main__':
+    main()
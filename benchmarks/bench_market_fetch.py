@@ -0,0 +1,78 @@
+"""
+End-to-end market data fetch timings against replayed upstream responses.
+
+Yahoo Finance and data.gov.in are served by a local ReplayServer from the
+fixtures in fixtures/market (re-record them with `python market_transport.py
+record`), under injected latency and failure conditions. Every iteration starts
+with empty caches and closed circuit breakers so each one pays the full fetch.
+
+Usage: python benchmarks/bench_market_fetch.py [iterations] [fixture_dir]
+"""
+import os
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_transport import DEFAULT_FIXTURE_DIR, ReplayServer
+
+# name -> ReplayServer.configure() arguments
+SCENARIOS = [
+    ('fast', {'latency': 0.005}),
+    ('slow', {'latency': 0.25, 'jitter': 0.25}),
+    ('flaky', {'latency': 0.05, 'failure_rate': 0.3}),
+    ('dropping', {'latency': 0.05, 'drop_rate': 0.3}),
+    ('down', {'failure_rate': 1.0})
+]
+
+def reset(service):
+    service.cache.clear()
+    service.history_cache.clear()
+    service.breakers = type(service.breakers)()
+
+def measure(call, service, iterations):
+    timings = []
+    for _ in range(iterations):
+        reset(service)
+        start = perf_counter()
+        call()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    fixture_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FIXTURE_DIR
+
+    server = ReplayServer(fixture_dir, seed=42).start()
+    # The shared market service picks the transport up from the environment on first use
+    os.environ['MARKET_TRANSPORT'] = 'replay'
+    os.environ['MARKET_REPLAY_URL'] = server.url
+
+    from market_data import get_market_service
+    service = get_market_service()
+
+    # Only calls that reach Yahoo Finance or data.gov.in: /api/all_sources serves curated fallbacks and
+    # /market_prices the background snapshot, so neither makes upstream requests in any scenario
+    calls = [
+        ('get_live_prices', service.get_live_prices),
+        ('get_market_intelligence', service.get_market_intelligence)
+    ]
+
+    print(f"{len(server.fixtures)} fixtures from {fixture_dir}, {iterations} iterations per call")
+    print(f"{'scenario':10} {'call':26} {'median ms':>10} {'max ms':>10} {'upstream req':>12} {'failed':>7}")
+    try:
+        for scenario, conditions in SCENARIOS:
+            server.configure(**conditions)
+            for name, call in calls:
+                before = dict(server.stats)
+                timings = measure(call, service, iterations)
+                requests_made = server.stats['requests'] - before['requests']
+                failed = (server.stats['failed'] + server.stats['dropped']) - (before['failed'] + before['dropped'])
+                print(f"{scenario:10} {name:26} {statistics.median(timings):>10.1f} {max(timings):>10.1f} "
+                      f"{requests_made / iterations:>12.1f} {failed / iterations:>7.1f}")
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import threading
+from time import monotonic
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+# Used for any setting a source does not override in its 'breaker' config
+DEFAULT_BREAKER_CONFIG = {
+    'failure_threshold': 3,   # consecutive failures before the circuit opens
+    'cooldown': 60            # seconds to wait before letting a trial request through
+}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a source whose circuit is open"""
+
+    def __init__(self, source, retry_in):
+        super().__init__(f"Circuit open for {source}, retry in {retry_in:.0f}s")
+        self.source = source
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one upstream source
+    Closed: calls go through and consecutive failures are counted
+    Open: calls fail fast until the cooldown has elapsed
+    Half-open: a single trial call is let through; success closes the circuit,
+    failure opens it for another cooldown
+    """
+
+    def __init__(self, source, failure_threshold=3, cooldown=60):
+        """
+        :param source: name used in errors and state reports
+        :param failure_threshold: consecutive failures before opening
+        :param cooldown: seconds the circuit stays open
+        """
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self.total_rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Check that a call may proceed
+        :return: True if this call is the half-open trial, which should make a single attempt
+                 (no retries) so a dead upstream costs one timeout per cooldown
+        :raise CircuitOpenError: if the circuit is open or a trial call is already running
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return False
+
+            if self.state == STATE_OPEN:
+                remaining = self.opened_at + self.cooldown - monotonic()
+                if remaining > 0:
+                    self.total_rejected += 1
+                    raise CircuitOpenError(self.source, remaining)
+                self.state = STATE_HALF_OPEN
+
+            if self.trial_in_flight:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.source, 0)
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = STATE_OPEN
+                self.opened_at = monotonic()
+            self.trial_in_flight = False
+
+    def snapshot(self):
+        """Current state for monitoring"""
+        with self._lock:
+            retry_in = None
+            if self.state == STATE_OPEN:
+                retry_in = max(0.0, round(self.opened_at + self.cooldown - monotonic(), 1))
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'cooldown': self.cooldown,
+                'retry_in': retry_in,
+                'rejected': self.total_rejected,
+                'last_error': self.last_error
+            }
+
+class BreakerRegistry:
+    """
+    One CircuitBreaker per source, created lazily from the source's 'breaker' config
+    """
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, source, config=None):
+        """
+        :param source: api_configs key
+        :param config: the source's api_configs entry (its 'breaker' dict overrides DEFAULT_BREAKER_CONFIG)
+        :return: CircuitBreaker
+        """
+        breaker = self._breakers.get(source)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(source)
+                if breaker is None:
+                    settings = {**DEFAULT_BREAKER_CONFIG, **(config or {}).get('breaker', {})}
+                    breaker = CircuitBreaker(source, settings['failure_threshold'], settings['cooldown'])
+                    self._breakers[source] = breaker
+        return breaker
+
+    def snapshot(self):
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {source: breaker.snapshot() for source, breaker in breakers}
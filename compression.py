@@ -0,0 +1,176 @@
+import gzip
+import mimetypes
+import os
+import sys
+from functools import wraps
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/manifest+json',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain'
+}
+
+# Precompressed variants looked up next to a static file, in order of preference
+STATIC_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header
+    :return: encoding -> q value (0 for encodings the client refuses)
+    """
+    accepted = {}
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+def choose_encoding(header, available=('br', 'gzip')):
+    """Best encoding both sides support, or None for identity"""
+    accepted = accepted_encodings(header)
+    candidates = [
+        (accepted.get(encoding, accepted.get('*', 0)), -rank, encoding)
+        for rank, encoding in enumerate(available)
+        if encoding != 'br' or brotli is not None
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates)[2] if candidates else None
+
+def compress(data, encoding, level):
+    """
+    :param encoding: 'gzip' or 'br'
+    :param level: gzip level 1-9 (brotli quality is scaled to 0-11)
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(11, round(level * 11 / 9)))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+class Compressor:
+    """
+    Negotiated gzip/brotli compression for Flask responses
+    Dynamic responses are compressed in after_request when they are large enough
+    and of a text-like type; static files are served from precompressed .br/.gz
+    siblings when those exist
+    """
+
+    def __init__(self, app=None, level=6, min_size=1024, mimetypes_=None):
+        """
+        :param app: Flask app to install on
+        :param level: compression level 1-9 (overridden by the COMPRESS_LEVEL config key)
+        :param min_size: smallest body in bytes worth compressing (COMPRESS_MIN_SIZE)
+        :param mimetypes_: compressible mimetypes (defaults to COMPRESSIBLE_MIMETYPES)
+        """
+        self.level = level
+        self.min_size = min_size
+        self.mimetypes = set(mimetypes_ or COMPRESSIBLE_MIMETYPES)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        app.after_request(self.after_request)
+        if 'static' in app.view_functions:
+            app.view_functions['static'] = self._precompressed_static(app, app.view_functions['static'])
+
+    def after_request(self, response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < self.min_size:
+            return response
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.set_data(compress(data, encoding, self.level))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes are a different representation of the same content
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _precompressed_static(self, app, static_view):
+        @wraps(static_view)
+        def view(filename):
+            available = [
+                (encoding, suffix) for encoding, suffix in STATIC_ENCODINGS
+                if os.path.isfile(os.path.join(app.static_folder, filename + suffix))
+            ]
+            encoding = choose_encoding(request.headers.get('Accept-Encoding'),
+                                       [encoding for encoding, suffix in available])
+            if encoding is None:
+                response = static_view(filename=filename)
+            else:
+                suffix = dict(available)[encoding]
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+            if available:
+                response.vary.add('Accept-Encoding')
+            return response
+        return view
+
+def precompress_static(static_folder, level=9):
+    """
+    Write .gz (and .br when brotli is installed) next to every compressible static file
+    :return: number of files written
+    """
+    written = 0
+    for root, dirs, files in os.walk(static_folder):
+        for name in files:
+            if name.endswith(('.gz', '.br')):
+                continue
+            mimetype = mimetypes.guess_type(name)[0]
+            if mimetype not in COMPRESSIBLE_MIMETYPES:
+                continue
+
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in STATIC_ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                compressed = compress(data, encoding, level)
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+if __name__ == '__main__':
+    # python compression.py [static_folder] - refresh the precompressed static assets
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    print(f"Wrote {precompress_static(folder)} precompressed files under {folder}")
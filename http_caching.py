@@ -0,0 +1,54 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+def etag_for(*parts):
+    """Strong ETag value derived from whatever determines a response's content"""
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+def cached_json(max_age, version=None, last_modified=None, private=False):
+    """
+    Decorator for GET views: sets ETag and Cache-Control and answers a matching
+    If-None-Match (or If-Modified-Since) with 304 Not Modified
+    :param max_age: seconds browsers, the service worker and proxies may reuse the response
+    :param version: callable taking the view's URL arguments and returning a token that changes
+                    whenever the response would (e.g. a snapshot version or the chain tip);
+                    with it a revalidation is answered before the view runs, without it the
+                    ETag is a hash of the response body
+    :param last_modified: callable taking the view's URL arguments and returning a datetime (naive = local time)
+    :param private: mark the response as cacheable by the browser only
+    """
+    cache_control = f"{'private' if private else 'public'}, max-age={max_age}"
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = None
+            modified = last_modified(**kwargs) if last_modified else None
+            if version is not None:
+                # The query string selects different content from the same version
+                etag = etag_for(version(**kwargs), request.full_path)
+                if request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                    return _set_cache_headers(response, etag, modified, cache_control)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            if etag is None:
+                etag = hashlib.sha1(response.get_data()).hexdigest()[:32]
+            _set_cache_headers(response, etag, modified, cache_control)
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+def _set_cache_headers(response, etag, modified, cache_control):
+    response.set_etag(etag)
+    if modified is not None:
+        # Naive datetimes are local time; HTTP dates are UTC
+        response.last_modified = modified.replace(microsecond=0).astimezone(timezone.utc)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,76 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Used for any setting a source does not override in its 'http' config
+DEFAULT_HTTP_CONFIG = {
+    'retries': 2,               # retries after the first attempt
+    'backoff_factor': 0.5,      # exponential backoff base in seconds
+    'backoff_jitter': 0.25,     # random extra delay per retry, in seconds
+    'backoff_max': 10,          # cap on any single backoff delay, jitter included
+    'status_forcelist': [429, 500, 502, 503, 504],
+    'pool_maxsize': 10          # keep-alive connections per host
+}
+
+class SessionPool:
+    """
+    One keep-alive requests.Session per market data source
+    Each session's adapter pools connections per host, so repeated refreshes
+    reuse TCP/TLS connections instead of handshaking on every call
+    """
+
+    def __init__(self, adapter_class=HTTPAdapter):
+        """
+        :param adapter_class: HTTPAdapter subclass mounted on every session
+        """
+        self.adapter_class = adapter_class
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, source, config=None, retries=True):
+        """
+        Get the shared session for a source, creating it on first use
+        :param source: api_configs key
+        :param config: the source's api_configs entry (its 'http' dict overrides DEFAULT_HTTP_CONFIG)
+        :param retries: False for a session that makes a single attempt per request (circuit breaker trials)
+        :return: requests.Session
+        """
+        key = (source, retries)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._build_session(config or {}, retries)
+                    self._sessions[key] = session
+        return session
+
+    def _build_session(self, config, retries=True):
+        settings = {**DEFAULT_HTTP_CONFIG, **config.get('http', {})}
+        retry = Retry(
+            total=settings['retries'] if retries else 0,
+            backoff_factor=settings['backoff_factor'],
+            backoff_jitter=settings['backoff_jitter'],
+            backoff_max=settings['backoff_max'],
+            status_forcelist=settings['status_forcelist'],
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False  # callers inspect the final status code themselves
+        )
+        adapter = self.adapter_class(
+            pool_connections=4,
+            pool_maxsize=settings['pool_maxsize'],
+            max_retries=retry
+        )
+
+        session = requests.Session()
+        session.headers.update(config.get('headers', {}))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
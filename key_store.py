@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class TraceabilityKeyStore:
+    """
+    File-backed Fernet key store shared by every worker and node
+    The newest key encrypts; every retained key is still accepted for decryption
+    Also holds the Ed25519 key that signs offline-verifiable QR payloads
+    """
+
+    def __init__(self, path=None, max_keys=3):
+        """
+        :param path: key file location (defaults to TRACEABILITY_KEY_FILE or traceability_keys.json)
+        :param max_keys: number of keys kept for decryption after rotation
+        """
+        self.path = path or os.getenv('TRACEABILITY_KEY_FILE', 'traceability_keys.json')
+        self.max_keys = max_keys
+        self.keys = []
+        self.cipher = None
+        self.signing_key = None
+        self.key_id = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def current_key(self):
+        """Key used for new encryptions"""
+        return self.keys[0]
+
+    def load(self):
+        """Load keys from disk, creating the key file on first use"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._create()
+
+            data = self._read()
+            if 'signing_key' not in data:
+                # Key files created before signed QRs existed; add one key under the file lock
+                # so concurrent workers don't each write their own
+                with self._file_lock():
+                    data = self._read()
+                    if 'signing_key' not in data:
+                        data['signing_key'] = self._new_signing_key()
+                        self._write(data)
+
+            keys = [key.encode() for key in data['fernet_keys']]
+            self.cipher = MultiFernet([Fernet(key) for key in keys])
+            self.keys = keys
+            self.signing_key = Ed25519PrivateKey.from_private_bytes(base64.b64decode(data['signing_key']))
+            self.key_id = hashlib.sha256(self.public_key_bytes()).hexdigest()[:8]
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def public_key_bytes(self):
+        """Raw 32-byte Ed25519 public key published for offline verification"""
+        return self.signing_key.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+
+    def refresh(self, max_age=0):
+        """
+        Reload the key file if another process rotated it
+        :param max_age: skip the check if the file was checked less than this many seconds ago
+        :return: True if new keys were loaded
+        """
+        now = time.monotonic()
+        if max_age and now - self._checked_at < max_age:
+            return False
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+
+        if mtime == self._mtime:
+            return False
+
+        self.load()
+        return True
+
+    def rotate(self):
+        """
+        Add a new encryption key, keeping older keys for decryption
+        :return: the new key
+        """
+        self.refresh()
+        with self._lock, self._file_lock():
+            data = self._read()
+            new_key = Fernet.generate_key()
+            # Start from the file, not self.keys, so a concurrent rotation elsewhere isn't lost
+            data['fernet_keys'] = ([new_key.decode()] + data['fernet_keys'])[:self.max_keys]
+            keys = [key.encode() for key in data['fernet_keys']]
+            data['rotated_at'] = datetime.now().isoformat()
+            self._write(data)
+            self.cipher = MultiFernet([Fernet(key) for key in keys])
+            self.keys = keys
+            self._mtime = os.stat(self.path).st_mtime_ns
+        return new_key
+
+    def _create(self):
+        """Create the key file atomically so concurrent workers agree on one key"""
+        tmp_path = self._write_temp({
+            'fernet_keys': [Fernet.generate_key().decode()],
+            'signing_key': self._new_signing_key(),
+            'created_at': datetime.now().isoformat()
+        })
+        try:
+            # link() fails if another worker created the file first; theirs wins
+            os.link(tmp_path, self.path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    def _read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across processes for read-modify-write updates of the key file"""
+        with open(f"{self.path}.lock", 'a+b') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @staticmethod
+    def _new_signing_key():
+        private_bytes = Ed25519PrivateKey.generate().private_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PrivateFormat.Raw,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        return base64.b64encode(private_bytes).decode()
+
+    def _write(self, data):
+        """Replace the key file atomically"""
+        os.replace(self._write_temp(data), self.path)
+
+    def _write_temp(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = os.path.join(directory, f".{os.path.basename(self.path)}.{uuid.uuid4().hex}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        return tmp_path
+
+if __name__ == '__main__':
+    # Usage: python key_store.py [rotate]
+    store = TraceabilityKeyStore()
+    if len(sys.argv) > 1 and sys.argv[1] == 'rotate':
+        store.rotate()
+        print(f"Rotated traceability key; {len(store.keys)} key(s) accepted for decryption")
+    else:
+        print(f"{store.path}: {len(store.keys)} key(s) accepted for decryption")
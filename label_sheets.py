@@ -0,0 +1,145 @@
+import zlib
+
+# Page sizes in PDF points (1/72 inch)
+PAGE_SIZES = {
+    'A4': (595.28, 841.89),
+    'A5': (419.53, 595.28),
+    'letter': (612.0, 792.0),
+    'legal': (612.0, 1008.0)
+}
+
+class LabelSheetPDF:
+    """
+    Streaming PDF writer that lays out square labels in a grid, N per page
+    Each object is emitted as soon as it is complete, so memory holds one label
+    image at a time plus the cross-reference offsets
+    """
+
+    def __init__(self, page_size='A4', columns=3, rows=4, margin=36, gutter=12):
+        """
+        :param page_size: key of PAGE_SIZES
+        :param columns: labels per row
+        :param rows: label rows per page
+        :param margin: page margin in points
+        :param gutter: space between labels in points
+        """
+        if page_size not in PAGE_SIZES:
+            raise ValueError(f"Unknown page size: {page_size}")
+        if columns < 1 or rows < 1:
+            raise ValueError("Label grid needs at least one column and one row")
+
+        self.page_width, self.page_height = PAGE_SIZES[page_size]
+        self.columns = columns
+        self.rows = rows
+        self.margin = margin
+        self.gutter = gutter
+
+        self.cell_width = (self.page_width - 2 * margin - (columns - 1) * gutter) / columns
+        self.cell_height = (self.page_height - 2 * margin - (rows - 1) * gutter) / rows
+        if self.cell_width <= 0 or self.cell_height <= 0:
+            raise ValueError("Label grid does not fit on the page")
+
+    @property
+    def labels_per_page(self):
+        return self.columns * self.rows
+
+    def stream(self, labels):
+        """
+        Write the PDF incrementally
+        :param labels: iterable of PIL images (rendered lazily by the caller)
+        :return: generator of bytes chunks
+        """
+        offsets = [None, None, None]  # index 0 unused; 1 = catalog, 2 = page tree
+        position = 0
+        page_ids = []
+
+        def emit(obj_id, body):
+            nonlocal position
+            offsets[obj_id] = position
+            chunk = f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n"
+            position += len(chunk)
+            return chunk
+
+        def new_id():
+            offsets.append(None)
+            return len(offsets) - 1
+
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        position += len(header)
+        yield header
+        yield emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        slot = 0
+        images = []
+        for label in labels:
+            image_id = new_id()
+            yield emit(image_id, self._image_object(label))
+            images.append(image_id)
+            slot += 1
+
+            if slot == self.labels_per_page:
+                for chunk in self._page(images, emit, new_id, page_ids):
+                    yield chunk
+                slot = 0
+                images = []
+
+        if images or not page_ids:
+            for chunk in self._page(images, emit, new_id, page_ids):
+                yield chunk
+
+        kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+        yield emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode())
+
+        xref = [f"xref\n0 {len(offsets)}\n", "0000000000 65535 f \n"]
+        xref.extend(f"{offset:010d} 00000 n \n" for offset in offsets[1:])
+        xref.append(f"trailer\n<< /Size {len(offsets)} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n")
+        yield ''.join(xref).encode()
+
+    def _page(self, images, emit, new_id, page_ids):
+        """Emit the content stream and page object for the labels placed so far"""
+        side = min(self.cell_width, self.cell_height)
+        commands = []
+        for slot, image_id in enumerate(images):
+            column = slot % self.columns
+            row = slot // self.columns
+            # PDF origin is bottom-left; fill rows from the top of the page
+            x = self.margin + column * (self.cell_width + self.gutter) + (self.cell_width - side) / 2
+            y = (self.page_height - self.margin - (row + 1) * self.cell_height - row * self.gutter
+                 + (self.cell_height - side) / 2)
+            commands.append(f"q {side:.2f} 0 0 {side:.2f} {x:.2f} {y:.2f} cm /Im{image_id} Do Q")
+
+        content = zlib.compress('\n'.join(commands).encode())
+        content_id = new_id()
+        yield emit(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode()
+                   + content + b"\nendstream")
+
+        xobjects = ' '.join(f"/Im{image_id} {image_id} 0 R" for image_id in images)
+        page_id = new_id()
+        page_ids.append(page_id)
+        yield emit(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.page_width:.2f} {self.page_height:.2f}] "
+            f"/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+
+    @staticmethod
+    def _image_object(image):
+        """Encode a label as a 1-bit grayscale image XObject"""
+        if image.mode != '1':
+            image = image.convert('L').point(lambda value: 255 if value >= 128 else 0, mode='1')
+        data = zlib.compress(image.tobytes(), 6)
+        width, height = image.size
+        return (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode /Length {len(data)} >>\nstream\n"
+        ).encode() + data + b"\nendstream"
+
+def render_labels(traceability_system, batches, mode):
+    """
+    Lazily render branded QR labels
+    :param traceability_system: TraceabilitySystem used to build each QR
+    :param batches: iterable of batch data dicts
+    :param mode: QR payload mode ('encrypted' or 'signed')
+    :return: generator of PIL images
+    """
+    for batch_data in batches:
+        yield traceability_system.build_qr(batch_data, include_logo=True, mode=mode)['image']
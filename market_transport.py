@@ -0,0 +1,265 @@
+import base64
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+# MARKET_TRANSPORT selects how MarketDataService reaches upstream sources
+TRANSPORT_LIVE = 'live'
+TRANSPORT_RECORD = 'record'
+TRANSPORT_REPLAY = 'replay'
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'market')
+
+# Query parameters left out of fixture keys and recorded URLs
+SECRET_PARAMS = {'api-key', 'api_key', 'apikey', 'token'}
+
+# Header carrying the original upstream URL to the replay server
+REPLAY_URL_HEADER = 'X-Replay-URL'
+
+logger = logging.getLogger(__name__)
+
+def redact_url(url):
+    """URL with secret query parameters removed and the rest sorted"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+def fixture_key(method, url):
+    """Stable key for an upstream request, independent of secrets and parameter order"""
+    return hashlib.sha1(f"{method.upper()} {redact_url(url)}".encode()).hexdigest()[:16]
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that passes requests upstream and writes every response to a fixture file
+    """
+
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR, **kwargs):
+        """
+        :param fixture_dir: directory the fixtures are written to
+        """
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        try:
+            self._write_fixture(request, response)
+        except OSError as e:
+            logger.warning(f"Could not record {redact_url(request.url)}: {e}")
+        return response
+
+    def _write_fixture(self, request, response):
+        body = response.content
+        fixture = {
+            'method': request.method,
+            'url': redact_url(request.url),
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'application/octet-stream'),
+            'recorded_at': datetime.now().isoformat()
+        }
+        try:
+            fixture['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            fixture['body_base64'] = base64.b64encode(body).decode('ascii')
+
+        host = urlsplit(request.url).hostname or 'unknown'
+        path = os.path.join(self.fixture_dir, f"{host}_{fixture_key(request.method, request.url)}.json")
+        with open(path, 'w') as f:
+            json.dump(fixture, f, indent=2)
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that sends every request to a ReplayServer instead of the upstream host
+    The original URL travels in a header so the server can pick the matching fixture
+    """
+
+    def __init__(self, replay_url, **kwargs):
+        """
+        :param replay_url: base URL of the ReplayServer, e.g. http://127.0.0.1:8765
+        """
+        self.replay_url = replay_url.rstrip('/')
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.headers[REPLAY_URL_HEADER] = request.url
+        request.url = self.replay_url + parts.path + (f"?{parts.query}" if parts.query else '')
+        return super().send(request, **kwargs)
+
+class ReplayServer:
+    """
+    Local HTTP server answering with recorded fixtures, with injected latency and failures
+    Conditions can be changed between runs with configure(); unknown requests get 404
+    """
+
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR, host='127.0.0.1', port=0, seed=None):
+        """
+        :param fixture_dir: directory of fixtures written by RecordingAdapter
+        :param port: port to listen on (0 picks a free one)
+        :param seed: seed for the latency jitter and failure draws, for repeatable runs
+        """
+        self.fixtures = self.load_fixtures(fixture_dir)
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.conditions = {}
+        self.configure()
+        self.stats = {'requests': 0, 'served': 0, 'failed': 0, 'dropped': 0, 'missing': 0}
+        self._stats_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def load_fixtures(fixture_dir):
+        """
+        :return: fixture key -> fixture
+        """
+        fixtures = {}
+        for path in sorted(glob.glob(os.path.join(fixture_dir, '*.json'))):
+            with open(path) as f:
+                fixture = json.load(f)
+            fixtures[fixture_key(fixture.get('method', 'GET'), fixture['url'])] = fixture
+        return fixtures
+
+    def configure(self, latency=0.0, jitter=0.0, failure_rate=0.0, failure_status=503, drop_rate=0.0):
+        """
+        Set the injected conditions for subsequent requests
+        :param latency: seconds added to every response
+        :param jitter: extra random delay of up to this many seconds
+        :param failure_rate: fraction of requests answered with failure_status instead of the fixture
+        :param failure_status: HTTP status for injected failures
+        :param drop_rate: fraction of connections closed without a response
+        """
+        self.conditions = {
+            'latency': latency,
+            'jitter': jitter,
+            'failure_rate': failure_rate,
+            'failure_status': failure_status,
+            'drop_rate': drop_rate
+        }
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='market-replay', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _draw(self):
+        with self._random_lock:
+            return self.random.random(), self.random.random(), self.random.random()
+
+    def _handler_class(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real upstreams
+
+            def do_GET(self):
+                server._count('requests')
+                conditions = server.conditions
+                jitter_draw, drop_draw, failure_draw = server._draw()
+                time.sleep(conditions['latency'] + conditions['jitter'] * jitter_draw)
+
+                if drop_draw < conditions['drop_rate']:
+                    server._count('dropped')
+                    self.close_connection = True
+                    return
+
+                if failure_draw < conditions['failure_rate']:
+                    server._count('failed')
+                    self._respond(conditions['failure_status'], 'application/json', b'{"error": "injected failure"}')
+                    return
+
+                url = self.headers.get(REPLAY_URL_HEADER, self.path)
+                fixture = server.fixtures.get(fixture_key(self.command, url))
+                if fixture is None:
+                    server._count('missing')
+                    self._respond(404, 'application/json', b'{"error": "no fixture"}')
+                    return
+
+                server._count('served')
+                if 'body_base64' in fixture:
+                    body = base64.b64decode(fixture['body_base64'])
+                else:
+                    body = fixture.get('body', '').encode('utf-8')
+                self._respond(fixture.get('status', 200), fixture.get('content_type', 'application/json'), body)
+
+            def _respond(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return ReplayHandler
+
+def adapter_from_env():
+    """
+    HTTPAdapter class (or factory) for MarketDataService sessions, chosen by environment:
+    MARKET_TRANSPORT=live (default) | record | replay, MARKET_FIXTURE_DIR for record mode,
+    MARKET_REPLAY_URL for replay mode
+    """
+    mode = os.getenv('MARKET_TRANSPORT', TRANSPORT_LIVE).lower()
+    if mode == TRANSPORT_RECORD:
+        return partial(RecordingAdapter, os.getenv('MARKET_FIXTURE_DIR', DEFAULT_FIXTURE_DIR))
+    if mode == TRANSPORT_REPLAY:
+        replay_url = os.getenv('MARKET_REPLAY_URL')
+        if not replay_url:
+            raise ValueError("MARKET_TRANSPORT=replay needs MARKET_REPLAY_URL")
+        return partial(ReplayAdapter, replay_url)
+    if mode != TRANSPORT_LIVE:
+        raise ValueError(f"Unknown MARKET_TRANSPORT: {mode}")
+    return HTTPAdapter
+
+if __name__ == '__main__':
+    # python market_transport.py record [fixture_dir] - fetch every live source once and save the responses
+    # python market_transport.py serve [fixture_dir] [port] - run the replay server in the foreground
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'record'
+    fixture_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FIXTURE_DIR
+
+    if command == 'record':
+        from market_data import MarketDataService
+        service = MarketDataService(http_adapter=partial(RecordingAdapter, fixture_dir))
+        service.get_live_prices()
+        print(f"Recorded {len(glob.glob(os.path.join(fixture_dir, '*.json')))} fixtures in {fixture_dir}")
+    elif command == 'serve':
+        server = ReplayServer(fixture_dir, port=int(sys.argv[3]) if len(sys.argv) > 3 else 8765)
+        print(f"Replaying {len(server.fixtures)} fixtures on {server.url} (MARKET_REPLAY_URL={server.url})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        sys.exit(f"Unknown command: {command}")
@@ -0,0 +1,131 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from price_store import get_price_store
+from ttl_cache import TTLCache
+
+# resolution -> pandas resample rule and options, periods per year (to annualize volatility), cache ttl in seconds
+RESOLUTIONS = {
+    'hourly': {'rule': '1h', 'resample': {}, 'periods_per_year': 24 * 365, 'ttl': 60},
+    'daily': {'rule': '1D', 'resample': {}, 'periods_per_year': 365, 'ttl': 300},
+    'weekly': {'rule': 'W-MON', 'resample': {'closed': 'left', 'label': 'left'}, 'periods_per_year': 52, 'ttl': 1800},
+    'monthly': {'rule': 'MS', 'resample': {}, 'periods_per_year': 12, 'ttl': 3600}
+}
+
+MAX_ANALYTICS_DAYS = 3650
+
+OHLC_COLUMNS = ['timestamp', 'source', 'market', 'open', 'high', 'low', 'close', 'volume', 'samples']
+
+class PriceAnalytics:
+    """
+    OHLC candles, moving averages and volatility over the recorded price series
+    Computed with pandas for every market of a variety in one pass and cached per resolution
+    """
+
+    def __init__(self, store=None, ma_windows: Tuple[int, ...] = (7, 30), volatility_window: int = 20):
+        """
+        :param store: PriceStore holding the recorded quotes
+        :param ma_windows: moving-average windows, in candles
+        :param volatility_window: rolling window for volatility, in candles
+        """
+        self.logger = logging.getLogger(__name__)
+        self.store = store or get_price_store()
+        self.ma_windows = ma_windows
+        self.volatility_window = volatility_window
+        self.cache = TTLCache(maxsize=512, ttl=300)
+
+    def candles(self, variety: str, resolution: str = 'daily', days: int = 90,
+                market: Optional[str] = None) -> Dict:
+        """
+        Candles with rolling statistics for each market of a variety
+        :param variety: variety key
+        :param resolution: one of RESOLUTIONS
+        :param days: how far back to aggregate (clamped to 1..MAX_ANALYTICS_DAYS)
+        :param market: restrict to one market (all markets when not given)
+        :return: {'series': {market: [candle, ...]}, ...}
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        days = max(1, min(int(days), MAX_ANALYTICS_DAYS))
+
+        return self.cache.get_or_load(
+            (variety, resolution, days, market),
+            lambda: self._compute(variety, resolution, days, market),
+            RESOLUTIONS[resolution]['ttl']
+        )
+
+    def _compute(self, variety, resolution, days, market):
+        end = datetime.now()
+        rows = self.store.series(variety, start=end - timedelta(days=days), end=end, market=market)
+
+        series = {}
+        if rows:
+            frame = pd.DataFrame.from_records(rows, columns=OHLC_COLUMNS).set_index('timestamp')
+            frame['volume'] = pd.to_numeric(frame['volume'], errors='coerce')
+            candles = self._aggregate(frame, RESOLUTIONS[resolution])
+            for market_name, group in candles.groupby(level='market', sort=True):
+                group = group.droplevel('market')
+                group.index = group.index.strftime('%Y-%m-%dT%H:%M' if resolution == 'hourly' else '%Y-%m-%d')
+                group = group.round(4).astype(object).where(group.notna(), None)
+                series[market_name or 'Unknown'] = group.reset_index(names='period').to_dict('records')
+
+        return {
+            'variety': variety,
+            'resolution': resolution,
+            'days': days,
+            'market': market,
+            'ma_windows': list(self.ma_windows),
+            'volatility_window': self.volatility_window,
+            'series': series,
+            'generated_at': end.isoformat()
+        }
+
+    def _aggregate(self, frame: pd.DataFrame, settings: Dict) -> pd.DataFrame:
+        """
+        Resample every market's observations to candles and add rolling statistics
+        :param frame: OHLC rows indexed by timestamp, with a market column
+        :param settings: RESOLUTIONS entry
+        :return: candles indexed by (market, period)
+        """
+        by_market = frame.groupby('market').resample(settings['rule'], **settings['resample'])
+        candles = pd.DataFrame({
+            'open': by_market['open'].first(),
+            'high': by_market['high'].max(),
+            'low': by_market['low'].min(),
+            'close': by_market['close'].last(),
+            'volume': by_market['volume'].sum(min_count=1),
+            'samples': by_market['samples'].sum()
+        })
+        # Resampling fills the gaps between observations with empty candles
+        candles = candles[candles['samples'] > 0].copy()
+
+        close = candles['close'].groupby(level='market')
+        for window in self.ma_windows:
+            candles[f'ma_{window}'] = close.transform(lambda values: values.rolling(window, min_periods=1).mean())
+
+        log_returns = np.log(candles['close']).groupby(level='market').diff()
+        candles['log_return'] = log_returns
+        candles['volatility'] = log_returns.groupby(level='market').transform(
+            lambda values: values.rolling(self.volatility_window, min_periods=2).std()
+        ) * np.sqrt(settings['periods_per_year'])
+
+        return candles
+
+_price_analytics = None
+_price_analytics_lock = threading.Lock()
+
+def get_price_analytics() -> PriceAnalytics:
+    """
+    Get the process-wide price analytics service (created lazily on first use)
+    """
+    global _price_analytics
+    if _price_analytics is None:
+        with _price_analytics_lock:
+            if _price_analytics is None:
+                _price_analytics = PriceAnalytics()
+    return _price_analytics
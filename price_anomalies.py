@@ -0,0 +1,146 @@
+import math
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from price_store import UNRECORDED_SOURCE_MARKERS
+
+class EwmaStats:
+    """Exponentially weighted mean and variance of one price series"""
+    __slots__ = ('mean', 'variance', 'count', 'last_observation')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+        self.last_observation = None  # (timestamp, price) of the last quote folded in
+
+    def update(self, price: float, alpha: float):
+        if self.count == 0:
+            self.mean = price
+        else:
+            diff = price - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.count += 1
+
+class AnomalyDetector:
+    """
+    Streaming spike/drop detection over incoming quotes
+    Keeps EWMA mean and variance per (variety, market, source) and scores each new
+    quote against them before folding it in, so every update is O(1) and reading
+    the alerts costs nothing beyond copying a short list
+    """
+
+    def __init__(self, alpha=0.2, z_threshold=3.0, warmup=5, min_change_pct=2.0,
+                 min_std_ratio=0.005, alert_ttl=6 * 3600, max_alerts=50):
+        """
+        :param alpha: EWMA smoothing factor (weight of the newest quote)
+        :param z_threshold: |z-score| at or above which a quote is a spike or drop
+        :param warmup: quotes a series needs before it is scored
+        :param min_change_pct: smallest deviation from the mean, in percent, that is alerted
+        :param min_std_ratio: floor on the standard deviation as a fraction of the mean (flat series)
+        :param alert_ttl: seconds an alert stays in alerts()
+        :param max_alerts: most recent alerts kept
+        """
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.min_change_pct = min_change_pct
+        self.min_std_ratio = min_std_ratio
+        self.alert_ttl = alert_ttl
+
+        self._stats = {}
+        self._alerts = deque(maxlen=max_alerts)
+        self._lock = threading.Lock()
+
+    def update(self, source: str, prices: Dict, observed_at: Optional[datetime] = None) -> List[Dict]:
+        """
+        Fold one source's quotes into the rolling statistics
+        Re-fetched quotes (same timestamp and price as last time) and fallback/curated/simulated
+        placeholders are not observations and are skipped
+        :param source: api_configs key the quotes came from
+        :param prices: variety key -> price data, as returned by the source fetchers
+        :param observed_at: detection time recorded on alerts
+        :return: alerts raised by these quotes
+        """
+        observed_at = observed_at or datetime.now()
+        raised = []
+        with self._lock:
+            for variety, quote in prices.items():
+                if not isinstance(quote, dict):
+                    continue
+                label = str(quote.get('source', '')).lower()
+                if any(marker in label for marker in UNRECORDED_SOURCE_MARKERS):
+                    continue
+                try:
+                    price = float(quote.get('price'))
+                except (TypeError, ValueError):
+                    continue
+                if not price > 0:
+                    continue
+
+                market = quote.get('market') or 'Unknown'
+                stats = self._stats.get((variety, market, source))
+                if stats is None:
+                    stats = self._stats[(variety, market, source)] = EwmaStats()
+
+                observation = (quote.get('last_updated') or quote.get('date'), price)
+                if observation == stats.last_observation:
+                    continue
+                stats.last_observation = observation
+
+                alert = self._score(stats, price, variety, market, source, observed_at)
+                if alert:
+                    self._alerts.append(alert)
+                    raised.append(alert)
+                stats.update(price, self.alpha)
+        return raised
+
+    def _score(self, stats, price, variety, market, source, observed_at) -> Optional[Dict]:
+        """Spike/drop alert for a quote against the statistics before it, or None"""
+        if stats.count < self.warmup:
+            return None
+        std = max(math.sqrt(stats.variance), abs(stats.mean) * self.min_std_ratio)
+        z_score = (price - stats.mean) / std
+        change_pct = (price - stats.mean) / stats.mean * 100
+        if abs(z_score) < self.z_threshold or abs(change_pct) < self.min_change_pct:
+            return None
+        return {
+            'type': 'spike' if z_score > 0 else 'drop',
+            'variety': variety,
+            'market': market,
+            'source': source,
+            'price': round(price, 2),
+            'expected': round(stats.mean, 2),
+            'change_pct': round(change_pct, 2),
+            'z_score': round(z_score, 2),
+            'detected_at': observed_at.isoformat()
+        }
+
+    def alerts(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Alerts raised within the last alert_ttl seconds, newest first"""
+        cutoff = ((now or datetime.now()) - timedelta(seconds=self.alert_ttl)).isoformat()
+        with self._lock:
+            return [alert for alert in reversed(self._alerts) if alert['detected_at'] >= cutoff]
+
+    def stats(self, variety: Optional[str] = None) -> List[Dict]:
+        """Current rolling statistics per series (optionally for one variety)"""
+        with self._lock:
+            return [
+                {
+                    'variety': key[0], 'market': key[1], 'source': key[2],
+                    'mean': round(stats.mean, 2),
+                    'std': round(math.sqrt(stats.variance), 4),
+                    'observations': stats.count
+                }
+                for key, stats in self._stats.items() if variety is None or key[0] == variety
+            ]
+
+def describe_alert(alert: Dict) -> str:
+    """One-line alert text for the intelligence panel"""
+    icon = '⚠️📈' if alert['type'] == 'spike' else '⚠️📉'
+    return (f"{icon} {alert['variety'].title()} price {alert['type']} at {alert['market']}: "
+            f"{alert['price']:.2f} per kg vs {alert['expected']:.2f} expected ({alert['change_pct']:+.1f}%)")
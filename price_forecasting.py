@@ -0,0 +1,250 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import get_price_store
+
+# Forecast horizons in days
+HORIZONS = {'next_week': 7, 'next_month': 30}
+
+# Days held out to measure each model's error before picking one per series
+HOLDOUT_DAYS = 7
+
+SEASON_LENGTH = 7  # weekly market-day pattern
+
+def _last_valid(matrix: np.ndarray) -> np.ndarray:
+    """Last non-NaN value of every column"""
+    valid = ~np.isnan(matrix)
+    last_index = matrix.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    return np.where(valid.any(axis=0), matrix[last_index, np.arange(matrix.shape[1])], np.nan)
+
+def naive_forecast(matrix: np.ndarray, steps: np.ndarray, **params) -> np.ndarray:
+    """Last observed value, for every step"""
+    return np.tile(_last_valid(matrix), (len(steps), 1))
+
+def seasonal_naive_forecast(matrix: np.ndarray, steps: np.ndarray, season=SEASON_LENGTH, **params) -> np.ndarray:
+    """Value from the same day of the last observed season"""
+    if matrix.shape[0] < season:
+        return naive_forecast(matrix, steps)
+    rows = matrix.shape[0] - season + (steps - 1) % season
+    return matrix[rows]
+
+def linear_trend_forecast(matrix: np.ndarray, steps: np.ndarray, window=60, **params) -> np.ndarray:
+    """Least-squares line through the last window days of each series, fitted for all series at once"""
+    recent = matrix[-window:]
+    x = np.arange(recent.shape[0], dtype=float)[:, None]
+    observed = ~np.isnan(recent)
+    y = np.where(observed, recent, 0.0)
+    n = observed.sum(axis=0)
+    sum_x = (x * observed).sum(axis=0)
+    sum_y = y.sum(axis=0)
+    sum_xx = (x * x * observed).sum(axis=0)
+    sum_xy = (x * y).sum(axis=0)
+
+    denominator = n * sum_xx - sum_x ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (n * sum_xy - sum_x * sum_y) / denominator, 0.0)
+        intercept = (sum_y - slope * sum_x) / n
+    return intercept + slope * (recent.shape[0] - 1 + steps[:, None])
+
+def holt_forecast(matrix: np.ndarray, steps: np.ndarray, alpha=0.3, beta=0.1, phi=0.98, **params) -> np.ndarray:
+    """
+    Damped-trend exponential smoothing (Holt), updated for all series per time step
+    Missing days leave a series' level and trend unchanged
+    """
+    level = np.full(matrix.shape[1], np.nan)
+    trend = np.zeros(matrix.shape[1])
+    for row in matrix:
+        observed = ~np.isnan(row)
+        starting = observed & np.isnan(level)
+        updating = observed & ~starting
+
+        previous = level + phi * trend
+        new_level = alpha * row + (1 - alpha) * previous
+        trend = np.where(updating, beta * (new_level - level) + (1 - beta) * phi * trend, trend)
+        level = np.where(starting, row, np.where(updating, new_level, level))
+
+    damping = np.cumsum(phi ** np.arange(1, steps.max() + 1))[steps - 1]
+    return level + damping[:, None] * trend
+
+MODELS = {
+    'naive': naive_forecast,
+    'seasonal_naive': seasonal_naive_forecast,
+    'linear_trend': linear_trend_forecast,
+    'holt': holt_forecast
+}
+
+class PriceForecaster:
+    """
+    Price forecasts for every variety and market in the price store
+    All series are aligned into one day x series matrix and each model is fitted to
+    every series at once; per series the model with the lowest holdout error is used.
+    Results are cached until the store records new quotes, and recomputed in the
+    background so readers always get the last result immediately
+    """
+
+    def __init__(self, store=None, history_days=365, min_observations=14):
+        """
+        :param store: PriceStore holding the recorded quotes
+        :param history_days: days of history the models are fitted to
+        :param min_observations: observed days a series needs to be forecast
+        """
+        self.logger = logging.getLogger(__name__)
+        self.store = store or get_price_store()
+        self.history_days = history_days
+        self.min_observations = min_observations
+
+        self._result = None
+        self._computing = False
+        self._lock = threading.Lock()
+
+    def forecasts(self) -> Dict:
+        """
+        Latest forecasts; a newer store version triggers a background recompute
+        Only the very first call (nothing cached yet) computes inline
+        :return: {'series': {variety: {market: forecast}}, 'data_version': ..., ...}
+        """
+        result = self._result
+        if result is None:
+            with self._lock:
+                if self._result is None:
+                    self._result = self.compute()
+                return self._result
+
+        if result['data_version'] != self.store.version:
+            with self._lock:
+                start = not self._computing
+                self._computing = True
+            if start:
+                threading.Thread(target=self._recompute, name='price-forecast', daemon=True).start()
+        return result
+
+    def forecast(self, variety: str, market: Optional[str] = None) -> Optional[Dict]:
+        """Forecast for one variety (the first of its markets when market is not given)"""
+        markets = self.forecasts()['series'].get(variety, {})
+        if market is not None:
+            return markets.get(market)
+        return next(iter(markets.values()), None)
+
+    def _recompute(self):
+        try:
+            result = self.compute()
+            with self._lock:
+                self._result = result
+        except Exception as e:
+            self.logger.warning(f"Price forecast recompute failed: {e}")
+        finally:
+            with self._lock:
+                self._computing = False
+
+    def compute(self) -> Dict:
+        """Fit every model to every stored series and forecast HORIZONS"""
+        version = self.store.version
+        end = datetime.now()
+        matrix, columns, days = self._daily_matrix(end - timedelta(days=self.history_days), end)
+
+        series = {}
+        if columns:
+            observed = ~np.isnan(matrix)
+            filled = pd.DataFrame(matrix).ffill().to_numpy()
+            keep = observed.sum(axis=0) >= self.min_observations
+            matrix, filled, observed = matrix[:, keep], filled[:, keep], observed[:, keep]
+            columns = [column for column, kept in zip(columns, keep) if kept]
+
+        if columns:
+            errors = self._holdout_errors(filled, matrix, observed)
+            model_names = list(MODELS)
+            best = np.argmin(np.where(np.isnan(errors['mape']), np.inf, errors['mape']), axis=0)
+
+            steps = np.array(list(HORIZONS.values()))
+            predictions = np.stack([MODELS[name](filled, steps) for name in model_names])  # model x horizon x series
+            chosen = predictions[best, :, np.arange(len(columns))]  # series x horizon
+            last_price = _last_valid(matrix)
+            last_day = days[matrix.shape[0] - 1 - np.argmax(observed[::-1], axis=0)]
+
+            for index, (variety, market) in enumerate(columns):
+                model = best[index]
+                forecast = {name: round(float(max(chosen[index, h], 0.0)), 2) for h, name in enumerate(HORIZONS)}
+                series.setdefault(variety, {})[market or 'Unknown'] = {
+                    'variety': variety,
+                    'market': market or 'Unknown',
+                    'last_price': round(float(last_price[index]), 2),
+                    'last_observed': last_day[index].date().isoformat(),
+                    'observations': int(observed[:, index].sum()),
+                    'model': model_names[model],
+                    'forecast': forecast,
+                    'change_pct': {
+                        name: round(float((value - last_price[index]) / last_price[index] * 100), 2)
+                        for name, value in forecast.items()
+                    },
+                    'error': {
+                        'mae': _rounded(errors['mae'][model, index]),
+                        'mape': _rounded(errors['mape'][model, index]),
+                        'holdout_days': HOLDOUT_DAYS
+                    }
+                }
+
+        return {
+            'series': series,
+            'horizons': dict(HORIZONS),
+            'models': list(MODELS),
+            'data_version': version,
+            'generated_at': end.isoformat()
+        }
+
+    def _daily_matrix(self, start, end):
+        """
+        :return: (days x series matrix of daily closes with NaN for days without quotes,
+                  [(variety, market)] column keys, DatetimeIndex of days)
+        """
+        rows = self.store.closes(start, end)
+        if not rows:
+            return np.empty((0, 0)), [], pd.DatetimeIndex([])
+
+        frame = pd.DataFrame.from_records(rows, columns=['timestamp', 'variety', 'market', 'close'])
+        frame['day'] = pd.to_datetime(frame['timestamp']).dt.normalize()
+        # Several sources and quotes on the same day: the day's mean close
+        daily = frame.groupby(['day', 'variety', 'market'])['close'].mean().unstack(['variety', 'market'])
+        daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq='D'))
+        return daily.to_numpy(dtype=float), list(daily.columns), daily.index
+
+    def _holdout_errors(self, filled, matrix, observed) -> Dict[str, np.ndarray]:
+        """
+        MAE and MAPE of every model over the last HOLDOUT_DAYS observed days, fitted on the days before
+        :return: {'mae': model x series, 'mape': model x series} (NaN without enough history)
+        """
+        shape = (len(MODELS), filled.shape[1])
+        if filled.shape[0] <= HOLDOUT_DAYS + SEASON_LENGTH:
+            return {'mae': np.full(shape, np.nan), 'mape': np.full(shape, np.nan)}
+
+        train = filled[:-HOLDOUT_DAYS]
+        actual = matrix[-HOLDOUT_DAYS:]
+        steps = np.arange(1, HOLDOUT_DAYS + 1)
+        mae, mape = np.empty(shape), np.empty(shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for index, model in enumerate(MODELS.values()):
+                error = np.abs(model(train, steps) - actual)
+                mae[index] = np.nanmean(np.where(observed[-HOLDOUT_DAYS:], error, np.nan), axis=0)
+                mape[index] = np.nanmean(np.where(observed[-HOLDOUT_DAYS:], error / np.abs(actual), np.nan), axis=0) * 100
+        return {'mae': mae, 'mape': mape}
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+_price_forecaster = None
+_price_forecaster_lock = threading.Lock()
+
+def get_price_forecaster() -> PriceForecaster:
+    """
+    Get the process-wide price forecaster (created lazily on first use)
+    """
+    global _price_forecaster
+    if _price_forecaster is None:
+        with _price_forecaster_lock:
+            if _price_forecaster is None:
+                _price_forecaster = PriceForecaster()
+    return _price_forecaster
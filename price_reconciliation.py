@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import UNRECORDED_SOURCE_MARKERS
+
+# Weight multiplier for fallback/curated/simulated placeholder quotes
+PLACEHOLDER_WEIGHT = 0.25
+
+# Robust z-score (deviation from the median in units of scaled MAD) above which a quote is an outlier
+OUTLIER_Z = 3.5
+
+def _parse_timestamp(value):
+    """Quote timestamps mix ISO datetimes and plain dates; unparseable ones become None"""
+    try:
+        return datetime.fromisoformat(str(value)) if value else None
+    except ValueError:
+        return None
+
+class PriceReconciler:
+    """
+    Combine every source's quote for a (variety, market) into one consensus price
+    All quotes from a refresh go into one DataFrame and are reconciled with grouped
+    pandas operations, so the cost is one pass regardless of how many varieties and
+    markets there are
+    """
+
+    def __init__(self, quality_weights: Optional[Dict[str, float]] = None, default_quality=0.5,
+                 freshness_half_life=3600, outlier_min_deviation=0.15):
+        """
+        :param quality_weights: source key -> trust weight (sources not listed get default_quality)
+        :param default_quality: weight for unlisted sources
+        :param freshness_half_life: quote age in seconds at which its weight halves
+        :param outlier_min_deviation: relative deviation from the median below which a quote is never an outlier
+        """
+        self.quality_weights = quality_weights or {}
+        self.default_quality = default_quality
+        self.freshness_half_life = freshness_half_life
+        self.outlier_min_deviation = outlier_min_deviation
+
+    def reconcile(self, quotes_by_source: Dict[str, Dict], source_ages: Optional[Dict[str, float]] = None,
+                  now: Optional[datetime] = None) -> Dict:
+        """
+        :param quotes_by_source: source key -> {variety key: quote}
+        :param source_ages: source key -> seconds since it was fetched, for quotes without a timestamp
+        :param now: reference time for quote ages
+        :return: variety key -> consensus (median, weighted_mean, spread, outliers, ...) with a per-market breakdown
+        """
+        frame = self._frame(quotes_by_source, source_ages or {}, now or datetime.now())
+        if frame.empty:
+            return {}
+
+        by_market = self._consensus(frame, ['variety', 'market'])
+        overall = self._consensus(frame, ['variety'])
+
+        markets = {}
+        for (variety, market), stats in by_market.items():
+            markets.setdefault(variety, {})[market] = stats
+
+        return {
+            variety: {**stats, 'markets': markets.get(variety, {})}
+            for (variety,), stats in overall.items()
+        }
+
+    def _frame(self, quotes_by_source, source_ages, now) -> pd.DataFrame:
+        """One row per quote with its weight"""
+        rows = [
+            (variety, quote.get('market') or 'Unknown', source, quote.get('price'),
+             quote.get('last_updated') or quote.get('date'), str(quote.get('source', '')))
+            for source, quotes in quotes_by_source.items() if quotes
+            for variety, quote in quotes.items() if isinstance(quote, dict)
+        ]
+        frame = pd.DataFrame.from_records(rows, columns=['variety', 'market', 'source', 'price', 'timestamp', 'label'])
+        frame['price'] = pd.to_numeric(frame['price'], errors='coerce')
+        frame = frame[frame['price'] > 0].copy()
+        if frame.empty:
+            return frame
+
+        # Age from the quote's own timestamp, else from when its source was fetched
+        timestamps = pd.to_datetime(frame['timestamp'].map(_parse_timestamp))
+        fetched_ages = frame['source'].map(source_ages).fillna(0.0)
+        ages = (pd.Timestamp(now) - timestamps).dt.total_seconds().fillna(fetched_ages).clip(lower=0)
+
+        quality = frame['source'].map(self.quality_weights).fillna(self.default_quality)
+        placeholder = frame['label'].str.lower().str.contains('|'.join(UNRECORDED_SOURCE_MARKERS), regex=True)
+        frame['weight'] = (quality * np.power(0.5, ages / self.freshness_half_life)
+                           * np.where(placeholder, PLACEHOLDER_WEIGHT, 1.0))
+        return frame
+
+    def _consensus(self, frame: pd.DataFrame, keys: List[str]) -> Dict:
+        """
+        Median, outlier-excluding weighted mean, range and outliers per group
+        :return: group key tuple -> stats
+        """
+        grouped = frame.groupby(keys, sort=False)['price']
+        median = grouped.transform('median')
+        deviation = (frame['price'] - median).abs()
+        mad = deviation.groupby([frame[key] for key in keys], sort=False).transform('median')
+        size = grouped.transform('count')
+
+        # Needs at least three quotes to tell which side is wrong
+        outlier = ((size >= 3)
+                   & (deviation > self.outlier_min_deviation * median)
+                   & ((mad == 0) | (deviation > OUTLIER_Z * 1.4826 * mad)))
+
+        weight = frame['weight'].where(~outlier, 0.0)
+        work = frame.assign(outlier=outlier, used_weight=weight, weighted_price=frame['price'] * weight)
+        stats = work.groupby(keys, sort=False).agg(
+            median=('price', 'median'),
+            low=('price', 'min'),
+            high=('price', 'max'),
+            quotes=('price', 'count'),
+            weight=('used_weight', 'sum'),
+            weighted_price=('weighted_price', 'sum')
+        )
+        stats['weighted_mean'] = (stats['weighted_price'] / stats['weight'].replace(0, np.nan)).fillna(stats['median'])
+        stats['spread'] = stats['high'] - stats['low']
+        stats['spread_pct'] = stats['spread'] / stats['median'] * 100
+
+        sources = work.groupby(keys, sort=False)['source'].agg(lambda values: sorted(set(values)))
+        outliers = work[work['outlier']]
+        outlier_lists = {}
+        for row in outliers.itertuples(index=False):
+            key = tuple(getattr(row, name) for name in keys)
+            outlier_lists.setdefault(key, []).append({'source': row.source, 'market': row.market, 'price': float(row.price)})
+
+        result = {}
+        for key, row in stats.iterrows():
+            key = key if isinstance(key, tuple) else (key,)
+            result[key] = {
+                'median': round(float(row['median']), 2),
+                'weighted_mean': round(float(row['weighted_mean']), 2),
+                'low': round(float(row['low']), 2),
+                'high': round(float(row['high']), 2),
+                'spread': round(float(row['spread']), 2),
+                'spread_pct': round(float(row['spread_pct']), 2),
+                'quotes': int(row['quotes']),
+                'sources': sources[key if len(key) > 1 else key[0]],
+                'outliers': outlier_lists.get(key, [])
+            }
+        return result
@@ -0,0 +1,392 @@
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from time import monotonic
+from typing import Dict, Optional
+
+from market_data import get_market_service
+
+# Quote fields whose change is pushed to stream subscribers (timestamps alone are not a change)
+DELTA_FIELDS = ('price', 'trend', 'change_percent', 'source', 'market', 'consensus_price')
+
+def price_delta(old_prices: Dict, new_prices: Dict) -> Dict:
+    """
+    Quotes that changed between two prices payloads
+    :return: {'changed': {variety: quote}, 'removed': [variety, ...]}
+    """
+    changed = {
+        variety: quote for variety, quote in new_prices.items()
+        if variety not in old_prices
+        or any(old_prices[variety].get(name) != quote.get(name) for name in DELTA_FIELDS)
+    }
+    removed = [variety for variety in old_prices if variety not in new_prices]
+    return {'changed': changed, 'removed': removed}
+
+def merge_deltas(deltas, new_prices: Dict) -> Dict:
+    """
+    Fold consecutive price_delta results into one delta from the first's base to new_prices
+    :param deltas: deltas in version order
+    :param new_prices: prices payload of the last delta's version
+    """
+    changed, removed = set(), set()
+    for delta in deltas:
+        changed.update(delta['changed'])
+        removed.difference_update(delta['changed'])
+        removed.update(delta['removed'])
+        changed.difference_update(delta['removed'])
+    return {
+        'changed': {variety: new_prices[variety] for variety in changed if variety in new_prices},
+        'removed': sorted(removed)
+    }
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """
+    Immutable live-price view published by the PriceRefresher
+    A new snapshot replaces the old one on every refresh; readers never see a partial update
+    """
+    version: int
+    data: Dict                  # get_live_prices-shaped response; treat as read-only
+    created_at: datetime
+    created_monotonic: float
+    source_fetched: Dict = field(default_factory=dict)   # config key -> monotonic time of its data
+    delta: Optional[Dict] = None  # price_delta against the previous version (None for the first)
+    regional: Optional[object] = None  # RegionalPriceMatrix built from these prices
+
+    @property
+    def age(self) -> float:
+        return monotonic() - self.created_monotonic
+
+class PriceRefresher:
+    """
+    Refreshes every live price source in the background on its own interval and
+    publishes the merged result as a PriceSnapshot
+    Requests read the latest snapshot without touching upstream APIs; a snapshot
+    older than a source's TTL is still served (flagged stale) while a refresh runs
+    """
+
+    def __init__(self, service=None, retry_interval=30, startup_wait=None, delta_history=32):
+        """
+        :param service: MarketDataService whose sources are refreshed
+        :param retry_interval: seconds before retrying a source whose refresh failed
+        :param startup_wait: seconds the first reader waits for an initial snapshot
+                             (defaults to the service's fetch deadline)
+        :param delta_history: recent versions whose deltas are kept, so stream clients that
+                              missed a few versions get a merged delta instead of a full snapshot
+        """
+        self.logger = logging.getLogger(__name__)
+        self.service = service or get_market_service()
+        self.retry_interval = retry_interval
+        self.startup_wait = self.service.fetch_deadline if startup_wait is None else startup_wait
+
+        self._snapshot = None
+        self._version = 0
+        self._results = {}       # config key -> (prices, monotonic fetch time)
+        self._next_due = {}      # config key -> monotonic time of the next refresh
+        self._in_flight = set()
+        self._errors = {}
+        self._intelligence = None  # (snapshot version, intelligence)
+        self._deltas = deque(maxlen=delta_history)  # (version, price_delta against version - 1)
+
+        self._lock = threading.Lock()
+        # Serializes snapshot builds, which run outside _lock so readers never wait on them
+        self._publish_lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._published = threading.Event()
+        self._thread = None
+
+    def ttl(self, source: str) -> float:
+        """Age after which a source's data counts as stale"""
+        return self.service.api_configs.get(source, {}).get('cache_ttl', self.service.default_cache_ttl)
+
+    def interval(self, source: str) -> float:
+        """Seconds between background refreshes; defaults to just inside the source's TTL"""
+        return self.service.api_configs.get(source, {}).get('refresh_interval', self.ttl(source) * 0.8)
+
+    def start(self):
+        """Start the background scheduler (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = monotonic()
+            with self._lock:
+                sources = [source for source, name, fetcher in self.service.price_sources()]
+                due = [source for source in sources if self._next_due.get(source, 0) <= now]
+                next_wake = min((self._next_due.get(source, now) for source in sources), default=now + 1)
+
+            for source in due:
+                self._start_refresh(source)
+
+            self._wake.wait(max(0.5, next_wake - monotonic()))
+            self._wake.clear()
+
+    def _start_refresh(self, source: str):
+        with self._lock:
+            if source in self._in_flight:
+                return
+            self._in_flight.add(source)
+            # Pushed back once the fetch completes; avoids resubmitting while in flight
+            self._next_due[source] = monotonic() + self.interval(source)
+
+        future = self.service.executor.submit(self.service.refresh_source, source)
+        future.add_done_callback(partial(self._on_refreshed, source))
+
+    def _on_refreshed(self, source: str, future):
+        now = monotonic()
+        try:
+            prices = future.result()
+            error = None if prices else 'no data returned'
+        except Exception as e:
+            prices = None
+            error = str(e)
+
+        if prices:
+            # O(1) per quote; alerts are ready before the snapshot that carries these prices is published
+            self.service.anomaly_detector.update(source, prices)
+
+        if prices and self.service.price_store is not None:
+            try:
+                self.service.price_store.record_quotes(source, prices)
+            except Exception as e:
+                self.logger.warning(f"Could not record {source} quotes: {e}")
+
+        with self._lock:
+            self._in_flight.discard(source)
+            if prices:
+                self._results[source] = (prices, now)
+                self._errors.pop(source, None)
+                self._next_due[source] = now + self.interval(source)
+            else:
+                # Keep serving the last good data for this source and retry sooner
+                self._errors[source] = error
+                self._next_due[source] = now + min(self.retry_interval, self.interval(source))
+                self.logger.warning(f"Background refresh of {source} failed: {error}")
+
+            publish = prices or self._snapshot is None
+
+        if publish:
+            self._publish()
+        self._wake.set()
+
+    def _publish(self):
+        """
+        Merge the latest result of every source into a new snapshot
+        Reconciliation and the regional matrix are built without holding _lock; only the
+        swap-in takes it. Builds are serialized, so each one starts from newer results than
+        the last and versions are published in order
+        """
+        with self._publish_lock:
+            with self._lock:
+                now = monotonic()
+                sources = dict(self._results)
+                pending = [source for source in self._in_flight if source not in self._results]
+
+            results = {source: prices for source, (prices, fetched) in sources.items()}
+            ages = {source: now - fetched for source, (prices, fetched) in sources.items()}
+            data = self.service.assemble_prices(results, pending, ages)
+
+            created_at = datetime.now()
+            try:
+                regional = self.service.regional_matrix(data, created_at)
+            except Exception as e:
+                self.logger.warning(f"Could not build the regional price matrix: {e}")
+                regional = None
+
+            # Only this method replaces the snapshot, and it holds _publish_lock
+            previous = self._snapshot
+            # Computed once here rather than once per stream subscriber
+            delta = price_delta(previous.data['prices'], data['prices']) if previous else None
+
+            with self._lock:
+                self._version += 1
+                self._snapshot = PriceSnapshot(
+                    version=self._version,
+                    data=data,
+                    created_at=created_at,
+                    created_monotonic=monotonic(),
+                    source_fetched={source: fetched for source, (prices, fetched) in sources.items()},
+                    delta=delta,
+                    regional=regional
+                )
+                if delta is not None:
+                    self._deltas.append((self._version, delta))
+                self._published.set()
+                self._updated.notify_all()
+
+    def snapshot(self) -> PriceSnapshot:
+        """
+        Latest published snapshot
+        Only the very first reader after startup waits, for at most startup_wait seconds
+        """
+        self.start()
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._published.wait(self.startup_wait)
+            if self._snapshot is None:
+                self._publish()
+            snapshot = self._snapshot
+        return snapshot
+
+    def delta_since(self, version: Optional[int], snapshot: PriceSnapshot) -> Optional[Dict]:
+        """
+        Changes between an earlier version and snapshot, merged from the recent delta history
+        :return: price_delta-shaped dict, or None if version is unknown or older than the history
+        """
+        if version is None or version >= snapshot.version:
+            return None
+        with self._lock:
+            deltas = [delta for delta_version, delta in self._deltas if version < delta_version <= snapshot.version]
+        if len(deltas) != snapshot.version - version:
+            return None
+        if len(deltas) == 1:
+            return deltas[0]
+        return merge_deltas(deltas, snapshot.data['prices'])
+
+    def wait_for_update(self, version: int, timeout: float) -> Optional[PriceSnapshot]:
+        """
+        Block until a snapshot newer than version is published
+        :return: the latest snapshot, or None if nothing newer arrived within timeout
+        """
+        with self._updated:
+            self._updated.wait_for(lambda: self._snapshot is not None and self._snapshot.version > version, timeout)
+            snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version > version else None
+
+    def stale_sources(self, snapshot: Optional[PriceSnapshot] = None) -> list:
+        """Sources whose data in the snapshot is older than their TTL (or missing)"""
+        snapshot = snapshot or self.snapshot()
+        now = monotonic()
+        return [
+            source for source, name, fetcher in self.service.price_sources()
+            if now - snapshot.source_fetched.get(source, float('-inf')) > self.ttl(source)
+        ]
+
+    def revalidate(self, sources=None):
+        """Refresh the given sources (default: all stale ones) now, without waiting for them"""
+        sources = self.stale_sources() if sources is None else sources
+        now = monotonic()
+        for source in sources:
+            with self._lock:
+                # A source that just failed waits out its retry interval
+                backing_off = source in self._errors and self._next_due.get(source, 0) > now
+            if not backing_off:
+                self._start_refresh(source)
+
+    def current(self, snapshot: Optional[PriceSnapshot] = None) -> Dict:
+        """
+        Live prices response for routes: served from the latest snapshot immediately,
+        with its age and staleness; a stale snapshot triggers a background revalidation
+        :param snapshot: snapshot to describe (defaults to the latest)
+        """
+        snapshot = snapshot or self.snapshot()
+        stale = self.stale_sources(snapshot)
+        if stale:
+            self.revalidate(stale)
+
+        with self._lock:
+            refreshing = sorted(self._in_flight)
+            errors = dict(self._errors)
+
+        return {
+            **snapshot.data,
+            'snapshot': {
+                'version': snapshot.version,
+                'created_at': snapshot.created_at.isoformat(),
+                'age_seconds': round(snapshot.age, 1),
+                'stale': bool(stale),
+                'stale_sources': stale,
+                'refreshing': refreshing,
+                'errors': errors
+            }
+        }
+
+    def market_intelligence(self, snapshot: Optional[PriceSnapshot] = None) -> Dict:
+        """Market intelligence derived from a snapshot (default: latest), computed once per snapshot version"""
+        snapshot = snapshot or self.snapshot()
+        cached = self._intelligence
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        intelligence = self.service.get_market_intelligence(snapshot.data)
+        self._intelligence = (snapshot.version, intelligence)
+        return intelligence
+
+    def get_price(self, crop: str, default=0):
+        """Price of one variety from the latest snapshot; never touches upstream APIs"""
+        return PriceContext(self).get_price(crop, default)
+
+    def context(self) -> 'PriceContext':
+        """Pin the latest snapshot for a unit of work, e.g. one request"""
+        return PriceContext(self)
+
+class PriceContext:
+    """
+    One PriceSnapshot pinned for the duration of a request, so every price lookup,
+    the live prices payload and the intelligence derived from them agree with each
+    other even if the refresher publishes mid-request
+    """
+
+    def __init__(self, refresher: PriceRefresher, snapshot: Optional[PriceSnapshot] = None):
+        """
+        :param refresher: PriceRefresher the snapshot comes from
+        :param snapshot: snapshot to pin (defaults to the latest)
+        """
+        self.refresher = refresher
+        self.snapshot = snapshot or refresher.snapshot()
+        self._live_data = None
+
+    @property
+    def prices(self) -> Dict:
+        return self.snapshot.data.get('prices', {})
+
+    @property
+    def live_data(self) -> Dict:
+        """Live prices response for the pinned snapshot, including its age and staleness"""
+        if self._live_data is None:
+            self._live_data = self.refresher.current(self.snapshot)
+        return self._live_data
+
+    def get_price(self, crop: str, default=0):
+        """
+        :param crop: variety key as used in the prices payload (case-insensitive)
+        :return: price per kg, or default when the snapshot has no quote for it
+        """
+        quote = self.prices.get(crop) or self.prices.get(crop.lower(), {})
+        return quote.get('price', default)
+
+    def intelligence(self) -> Dict:
+        return self.refresher.market_intelligence(self.snapshot)
+
+    @property
+    def regional(self):
+        """RegionalPriceMatrix of the pinned snapshot (built from fallback prices if the snapshot has none)"""
+        return self.snapshot.regional or self.refresher.service.fallback_regional_matrix()
+
+_price_refresher = None
+_price_refresher_lock = threading.Lock()
+
+def get_price_refresher() -> PriceRefresher:
+    """
+    Get the process-wide price refresher, starting its background thread on first use
+    """
+    global _price_refresher
+    if _price_refresher is None:
+        with _price_refresher_lock:
+            if _price_refresher is None:
+                _price_refresher = PriceRefresher()
+                _price_refresher.start()
+    return _price_refresher
@@ -0,0 +1,460 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from time import monotonic
+from typing import Dict, List, Optional
+
+RESOLUTIONS = ('daily', 'weekly')
+
+# Quotes whose source label contains one of these are placeholders, not observed prices
+UNRECORDED_SOURCE_MARKERS = ('fallback', 'curated', 'simulated', 'market intelligence')
+
+class PriceStore:
+    """
+    SQLite time series of every fetched market quote, keyed by (source, variety, market, ts)
+    Raw quotes are kept for raw_retention_days, then rolled up into daily bars which
+    are kept for daily_retention_days. Each daily bar is rebuilt from the parts it was
+    made of (backfilled dump rows, rolled-up quotes), kept in price_daily_parts
+    """
+
+    def __init__(self, db_path=None, raw_retention_days=90, daily_retention_days=3650):
+        """
+        :param db_path: SQLite file (defaults to $PRICE_DB_PATH or prices.db)
+        :param raw_retention_days: age after which raw quotes are rolled up into daily bars
+        :param daily_retention_days: age after which daily bars are deleted
+        """
+        self.db_path = db_path or os.getenv('PRICE_DB_PATH', 'prices.db')
+        self.raw_retention_days = raw_retention_days
+        self.daily_retention_days = daily_retention_days
+        self.retention_interval = 3600  # seconds between automatic retention passes
+        self._next_retention = 0
+        self._retention_lock = threading.Lock()
+        self.init_db()
+
+    def init_db(self):
+        """Create the quote and daily bar tables if they don't exist"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')  # readers don't block the refresher's writes
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_quotes (
+                    source TEXT NOT NULL,
+                    variety TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    price REAL NOT NULL,
+                    volume REAL,
+                    PRIMARY KEY (source, variety, market, ts)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_quotes_variety_ts ON price_quotes (variety, ts)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_daily (
+                    source TEXT NOT NULL,
+                    variety TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume REAL,
+                    samples INTEGER NOT NULL,
+                    PRIMARY KEY (source, variety, market, day)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_daily_variety_day ON price_daily (variety, day)')
+            parts_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_daily_parts'").fetchone()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_daily_parts (
+                    source TEXT NOT NULL,
+                    variety TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume REAL,
+                    samples INTEGER NOT NULL,
+                    UNIQUE (source, variety, market, day, ts, close)
+                )
+            ''')
+            if not parts_exist:
+                # Bars stored before parts were kept become the only part of their day
+                conn.execute('''
+                    INSERT OR IGNORE INTO price_daily_parts
+                        (source, variety, market, day, ts, open, high, low, close, volume, samples)
+                    SELECT source, variety, market, day, 0, open, high, low, close, volume, samples FROM price_daily
+                ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_store_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            conn.execute("INSERT OR IGNORE INTO price_store_meta (key, value) VALUES ('version', 0)")
+            conn.commit()
+
+    @property
+    def version(self) -> int:
+        """
+        Data version, bumped in the same transaction as every write that changes stored prices
+        Kept in the database, so writes from other processes (e.g. a backfill) are seen too;
+        derived data (e.g. forecasts) is cached per version
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT value FROM price_store_meta WHERE key = 'version'").fetchone()[0]
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute("UPDATE price_store_meta SET value = value + 1 WHERE key = 'version'")
+
+    @staticmethod
+    def _quote_time(quote: Dict, fetched_at: datetime) -> int:
+        """Unix time of a quote: its own timestamp when it has one, else the fetch time"""
+        for field in ('last_updated', 'date'):
+            value = quote.get(field)
+            if value:
+                try:
+                    return int(datetime.fromisoformat(str(value)).timestamp())
+                except ValueError:
+                    continue
+        return int(fetched_at.timestamp())
+
+    def record_quotes(self, source: str, prices: Dict, fetched_at: Optional[datetime] = None) -> int:
+        """
+        Store one source's observed quotes; a quote already stored for the same key is ignored
+        and fallback/curated/simulated placeholders are skipped
+        :param source: api_configs key the quotes came from
+        :param prices: variety key -> price data, as returned by the source fetchers
+        :param fetched_at: fetch time for quotes without their own timestamp
+        :return: number of new rows
+        """
+        fetched_at = fetched_at or datetime.now()
+        rows = []
+        for variety, quote in prices.items():
+            label = str(quote.get('source', '')).lower()
+            if any(marker in label for marker in UNRECORDED_SOURCE_MARKERS):
+                continue
+            try:
+                price = float(quote.get('price'))
+            except (TypeError, ValueError):
+                continue
+            rows.append((source, variety, quote.get('market') or '', self._quote_time(quote, fetched_at),
+                         price, quote.get('volume')))
+
+        with sqlite3.connect(self.db_path) as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO price_quotes (source, variety, market, ts, price, volume)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            inserted = conn.total_changes - before
+            if inserted:
+                self._bump_version(conn)
+            conn.commit()
+
+        self.maybe_apply_retention()
+        return inserted
+
+    def record_daily_bars(self, bars: List[tuple], conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Store daily OHLC bars without a time of day (e.g. from historical dumps) as parts of the
+        bar for their source, variety, market and day, and rebuild those bars from all their parts.
+        A part with the same day and close as one already stored is ignored, so bars of one day can
+        arrive in several pieces (e.g. split across chunks) and loading the same data again, from
+        any file, changes nothing
+        :param bars: (source, variety, market, day, open, high, low, close, volume, samples) tuples,
+                     in time order within each day
+        :param conn: connection to write on without committing, so callers can make it part of
+                     their own transaction (a new connection that commits when not given)
+        :return: number of daily bars inserted or changed
+        """
+        return self._record_daily_parts([bar[:4] + (0,) + tuple(bar[4:]) for bar in bars], conn)
+
+    def _record_daily_parts(self, parts: List[tuple], conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Store new parts of daily bars and rebuild the bars of the days they belong to
+        :param parts: (source, variety, market, day, ts, open, high, low, close, volume, samples) tuples,
+                      ts 0 for parts without a time of day (ordered before timed parts of the same day)
+        :param conn: connection to write on without committing (a new connection that commits when not given)
+        :return: number of daily bars inserted or changed
+        """
+        if conn is None:
+            with sqlite3.connect(self.db_path) as conn:
+                written = self._record_daily_parts(parts, conn)
+                conn.commit()
+            return written
+
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT OR IGNORE INTO price_daily_parts (source, variety, market, day, ts, open, high, low, close, volume, samples)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', parts)
+        if conn.total_changes == before:
+            return 0
+
+        # Rebuild every touched day's bar from all of its parts in one statement
+        conn.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS touched_days (
+                source TEXT, variety TEXT, market TEXT, day TEXT,
+                PRIMARY KEY (source, variety, market, day)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('DELETE FROM touched_days')
+        conn.executemany('INSERT OR IGNORE INTO touched_days VALUES (?, ?, ?, ?)', (part[:4] for part in parts))
+        before = conn.total_changes
+        conn.execute('''
+            INSERT INTO price_daily (source, variety, market, day, open, high, low, close, volume, samples)
+            SELECT source, variety, market, day, first_open, MAX(high), MIN(low), last_close, SUM(volume), SUM(samples)
+            FROM (
+                SELECT p.source, p.variety, p.market, p.day, p.high, p.low, p.volume, p.samples,
+                    FIRST_VALUE(p.open) OVER (PARTITION BY p.source, p.variety, p.market, p.day
+                                              ORDER BY p.ts, p.rowid) AS first_open,
+                    FIRST_VALUE(p.close) OVER (PARTITION BY p.source, p.variety, p.market, p.day
+                                               ORDER BY p.ts DESC, p.rowid DESC) AS last_close
+                FROM touched_days t JOIN price_daily_parts p
+                    ON p.source = t.source AND p.variety = t.variety AND p.market = t.market AND p.day = t.day
+            ) WHERE true
+            GROUP BY source, variety, market, day
+            ON CONFLICT (source, variety, market, day) DO UPDATE SET
+                open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close,
+                volume = excluded.volume, samples = excluded.samples
+            WHERE open IS NOT excluded.open OR high IS NOT excluded.high OR low IS NOT excluded.low
+               OR close IS NOT excluded.close OR volume IS NOT excluded.volume OR samples IS NOT excluded.samples
+        ''')
+        written = conn.total_changes - before
+        if written:
+            self._bump_version(conn)
+        return written
+
+    def query(self, variety: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              market: Optional[str] = None, source: Optional[str] = None) -> List[Dict]:
+        """
+        Raw quotes for a variety in [start, end], oldest first
+        """
+        sql = 'SELECT source, variety, market, ts, price, volume FROM price_quotes WHERE variety = ? AND ts BETWEEN ? AND ?'
+        params = [variety, int(start.timestamp()) if start else 0, int(end.timestamp()) if end else 2 ** 62]
+        if market:
+            sql += ' AND market = ?'
+            params.append(market)
+        if source:
+            sql += ' AND source = ?'
+            params.append(source)
+        sql += ' ORDER BY ts'
+
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                'source': row[0],
+                'variety': row[1],
+                'market': row[2],
+                'timestamp': datetime.fromtimestamp(row[3]).isoformat(),
+                'price': row[4],
+                'volume': row[5]
+            }
+            for row in rows
+        ]
+
+    def series(self, variety: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               market: Optional[str] = None) -> List[tuple]:
+        """
+        Every stored observation for a variety as OHLC rows, for bulk (e.g. pandas) analysis
+        Rolled-up days appear as one row at midnight; raw quotes as rows with open = high = low = close
+        :return: (timestamp, source, market, open, high, low, close, volume, samples) tuples, oldest first
+        """
+        start = start or datetime(1970, 1, 1)
+        end = end or datetime.now()
+
+        daily_sql = '''SELECT day, source, market, open, high, low, close, volume, samples FROM price_daily
+                       WHERE variety = ? AND day BETWEEN ? AND ?'''
+        daily_params = [variety, start.date().isoformat(), end.date().isoformat()]
+        raw_sql = '''SELECT ts, source, market, price, price, price, price, volume, 1 FROM price_quotes
+                     WHERE variety = ? AND ts BETWEEN ? AND ?'''
+        raw_params = [variety, int(start.timestamp()), int(end.timestamp())]
+        if market:
+            daily_sql += ' AND market = ?'
+            daily_params.append(market)
+            raw_sql += ' AND market = ?'
+            raw_params.append(market)
+
+        with sqlite3.connect(self.db_path) as conn:
+            daily = conn.execute(daily_sql, daily_params).fetchall()
+            raw = conn.execute(raw_sql + ' ORDER BY ts', raw_params).fetchall()
+
+        rows = [(datetime.fromisoformat(row[0]),) + tuple(row[1:]) for row in daily]
+        rows.extend((datetime.fromtimestamp(row[0]),) + tuple(row[1:]) for row in raw)
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def coverage(self, variety: str, start: Optional[date] = None, end: Optional[date] = None) -> List[tuple]:
+        """
+        Recorded days per source and market for a variety in [start, end], rolled-up and raw combined
+        :return: (source, market, days with data) tuples
+        """
+        start = start or date(1970, 1, 1)
+        end = end or date.today()
+        start_time = datetime.combine(start, datetime.min.time())
+        end_time = datetime.combine(end, datetime.max.time())
+
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('''
+                SELECT source, market, COUNT(DISTINCT day) FROM (
+                    SELECT source, market, day FROM price_daily WHERE variety = ? AND day BETWEEN ? AND ?
+                    UNION ALL
+                    SELECT source, market, date(ts, 'unixepoch', 'localtime') FROM price_quotes
+                    WHERE variety = ? AND ts BETWEEN ? AND ?
+                ) GROUP BY source, market
+            ''', (variety, start.isoformat(), end.isoformat(),
+                  variety, int(start_time.timestamp()), int(end_time.timestamp()))).fetchall()
+
+    def closes(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[tuple]:
+        """
+        Every stored close across all varieties, markets and sources, for batch jobs
+        Rolled-up days appear as one row at midnight; raw quotes as their price
+        :return: (timestamp, variety, market, close) tuples, oldest first
+        """
+        start = start or datetime(1970, 1, 1)
+        end = end or datetime.now()
+
+        with sqlite3.connect(self.db_path) as conn:
+            daily = conn.execute('''SELECT day, variety, market, close FROM price_daily WHERE day BETWEEN ? AND ?''',
+                                 (start.date().isoformat(), end.date().isoformat())).fetchall()
+            raw = conn.execute('''SELECT ts, variety, market, price FROM price_quotes WHERE ts BETWEEN ? AND ?''',
+                               (int(start.timestamp()), int(end.timestamp()))).fetchall()
+
+        rows = [(datetime.fromisoformat(row[0]),) + tuple(row[1:]) for row in daily]
+        rows.extend((datetime.fromtimestamp(row[0]),) + tuple(row[1:]) for row in raw)
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def downsample(self, variety: str, resolution: str = 'daily', start: Optional[date] = None,
+                   end: Optional[date] = None, market: Optional[str] = None,
+                   source: Optional[str] = None) -> List[Dict]:
+        """
+        OHLC bars for a variety across the matching sources and markets, oldest first
+        Combines rolled-up daily bars with bars computed from raw quotes
+        :param resolution: 'daily' or 'weekly' (weeks start on Monday)
+        :return: bars with period, open, high, low, close, volume and samples
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        start = start or date(1970, 1, 1)
+        end = end or date.today()
+        daily = self._stored_daily_bars(variety, start, end, market, source)
+        start_time = datetime.combine(start, datetime.min.time())
+        end_time = datetime.combine(end, datetime.max.time())
+        daily.extend(self._bars(
+            ((datetime.fromisoformat(quote['timestamp']).date(), quote['price'], quote['price'], quote['price'],
+              quote['price'], quote['volume'], 1)
+             for quote in self.query(variety, start_time, end_time, market, source)),
+            key=lambda row: row[0]
+        ))
+        daily.sort(key=lambda bar: bar['period'])
+
+        # Fold bars from different sources/markets (and rolled-up plus raw) into one per period
+        rows = [(date.fromisoformat(bar['period']), bar['open'], bar['high'], bar['low'], bar['close'],
+                 bar['volume'], bar['samples']) for bar in daily]
+        if resolution == 'daily':
+            return self._bars(rows, key=lambda row: row[0])
+        return self._bars(rows, key=lambda row: row[0] - timedelta(days=row[0].weekday()))
+
+    def _stored_daily_bars(self, variety, start, end, market, source):
+        sql = '''SELECT day, open, high, low, close, volume, samples FROM price_daily
+                 WHERE variety = ? AND day BETWEEN ? AND ?'''
+        params = [variety, start.isoformat(), end.isoformat()]
+        if market:
+            sql += ' AND market = ?'
+            params.append(market)
+        if source:
+            sql += ' AND source = ?'
+            params.append(source)
+        sql += ' ORDER BY day'
+
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [
+            {'period': row[0], 'open': row[1], 'high': row[2], 'low': row[3], 'close': row[4],
+             'volume': row[5], 'samples': row[6]}
+            for row in rows
+        ]
+
+    @staticmethod
+    def _bars(rows, key):
+        """
+        Fold time-ordered (day, open, high, low, close, volume, samples) rows into one bar per key
+        """
+        bars = []
+        for period, group in groupby(rows, key=key):
+            group = list(group)
+            volumes = [row[5] for row in group if row[5] is not None]
+            bars.append({
+                'period': period.isoformat(),
+                'open': group[0][1],
+                'high': max(row[2] for row in group),
+                'low': min(row[3] for row in group),
+                'close': group[-1][4],
+                'volume': sum(volumes) if volumes else None,
+                'samples': sum(row[6] for row in group)
+            })
+        return bars
+
+    def maybe_apply_retention(self):
+        """Run apply_retention at most once per retention_interval"""
+        if monotonic() < self._next_retention or not self._retention_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_retention = monotonic() + self.retention_interval
+            self.apply_retention()
+        finally:
+            self._retention_lock.release()
+
+    def apply_retention(self) -> Dict:
+        """
+        Roll raw quotes older than raw_retention_days up into daily bars, then delete
+        daily bars older than daily_retention_days
+        :return: counts of rolled-up quotes and deleted bars
+        """
+        raw_cutoff = datetime.combine(date.today() - timedelta(days=self.raw_retention_days), datetime.min.time())
+        daily_cutoff = (date.today() - timedelta(days=self.daily_retention_days)).isoformat()
+
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT source, variety, market, ts, price, volume FROM price_quotes WHERE ts < ?
+            ''', (int(raw_cutoff.timestamp()),)).fetchall()
+
+            # Each quote becomes a part of its day's bar, so a day that already has a bar
+            # (e.g. from a backfill) keeps it and gains these quotes
+            written = self._record_daily_parts([
+                (source, variety, market, date.fromtimestamp(ts).isoformat(), ts, price, price, price, price, volume, 1)
+                for source, variety, market, ts, price, volume in rows
+            ], conn)
+            conn.execute('DELETE FROM price_quotes WHERE ts < ?', (int(raw_cutoff.timestamp()),))
+            conn.execute('DELETE FROM price_daily_parts WHERE day < ?', (daily_cutoff,))
+            deleted = conn.execute('DELETE FROM price_daily WHERE day < ?', (daily_cutoff,)).rowcount
+            if rows or deleted:
+                self._bump_version(conn)
+            conn.commit()
+
+        return {'rolled_up_quotes': len(rows), 'daily_bars_written': written, 'daily_bars_deleted': deleted}
+
+_price_store = None
+_price_store_lock = threading.Lock()
+
+def get_price_store() -> PriceStore:
+    """
+    Get the process-wide price store (created lazily on first use)
+    """
+    global _price_store
+    if _price_store is None:
+        with _price_store_lock:
+            if _price_store is None:
+                _price_store = PriceStore()
+    return _price_store
@@ -1,11 +1,23 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 import json
+from statistics import median
 from datetime import datetime
 from typing import Dict, List
+from price_forecasting import get_price_forecaster
+from market_data import PROXY_MARKETS
 
 # Procurement partner blueprint
 procurement_bp = Blueprint('procurement', __name__, url_prefix='/procurement')
 
+# Shown for crops without a stored price series to forecast from
+DEFAULT_PRICE_PREDICTIONS = {
+    'turmeric': {'next_week': '+2-3%', 'next_month': '+5-7%'},
+    'rice': {'next_week': 'stable', 'next_month': '+1-2%'}
+}
+
+# Crop -> the recorded variety keys forecast for it (as normalized by market_data.map_turmeric_variety)
+FORECAST_CROPS = {'turmeric': ('alleppey', 'erode', 'nizamabad', 'rajapore', 'duggirala', 'other')}
+
 # In-memory storage for procurement data (in production, use database)
 procurement_orders = []
 partner_profiles = {}
@@ -121,10 +133,7 @@ def market_insights():
             'rice': 'Stable domestic demand',
             'wheat': 'Seasonal demand increase expected'
         },
-        'price_predictions': {
-            'turmeric': {'next_week': '+2-3%', 'next_month': '+5-7%'},
-            'rice': {'next_week': 'stable', 'next_month': '+1-2%'}
-        },
+        'price_predictions': price_predictions(),
         'supply_alerts': [
             'Turmeric supply expected to increase next week',
             'Rice quality premium commanding higher prices',
@@ -138,6 +147,41 @@ def market_insights():
     }
     return jsonify(insights)
 
+def price_predictions() -> Dict:
+    """
+    Expected price change per crop from the cached batch forecasts
+    A crop's change and error (holdout MAPE) are the medians over its varieties and mandi markets;
+    proxy series (global commodity futures stored under turmeric keys) are left out, and
+    crops without forecasts keep the default text
+    """
+    try:
+        series = get_price_forecaster().forecasts()['series']
+    except Exception:
+        series = {}
+
+    predictions = dict(DEFAULT_PRICE_PREDICTIONS)
+    for crop, varieties in FORECAST_CROPS.items():
+        forecasts = [
+            forecast for variety in varieties
+            for market, forecast in series.get(variety, {}).items() if market not in PROXY_MARKETS
+        ]
+        if not forecasts:
+            continue
+
+        prediction = {'source': 'forecast', 'series': len(forecasts)}
+        for horizon in ('next_week', 'next_month'):
+            change = median([forecast['change_pct'][horizon] for forecast in forecasts])
+            prediction[horizon] = 'stable' if abs(change) < 0.5 else f"{change:+.1f}%"
+        errors = [forecast['error']['mape'] for forecast in forecasts if forecast['error']['mape'] is not None]
+        prediction['mape'] = round(median(errors), 2) if errors else None
+        predictions[crop] = prediction
+    return predictions
+
+@procurement_bp.route('/api/price_forecasts')
+def price_forecasts():
+    """Per variety and market price forecasts with the chosen model and its error"""
+    return jsonify(get_price_forecaster().forecasts())
+
 @procurement_bp.route('/logout')
 def logout():
     session.pop('partner_id', None)
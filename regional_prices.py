@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Buying in one market and selling in another only pays above this margin (transport, handling, commission)
+DEFAULT_TRANSFER_COST_PCT = 3.0
+
+class RegionalPriceMatrix:
+    """
+    Prices of every variety in every market, as one varieties x markets matrix
+    Built once per base price refresh: the modelled prices are a single outer product
+    of base prices and market multipliers, overlaid with prices actually quoted in a
+    market. Region payloads, spreads and arbitrage opportunities are derived at build
+    time, so serving them is a lookup
+    """
+
+    def __init__(self, quotes: Dict[str, Dict], multipliers: Dict[str, float],
+                 observed: Optional[Dict[str, Dict[str, float]]] = None,
+                 transfer_cost_pct: float = DEFAULT_TRANSFER_COST_PCT, created_at: Optional[datetime] = None):
+        """
+        :param quotes: variety key -> quote (price, unit, trend, source, variety, market) used as its base price
+        :param multipliers: market -> price level relative to the base market (1.0)
+        :param observed: variety key -> {market: price actually quoted there}, overriding the modelled price
+        :param transfer_cost_pct: margin an arbitrage must clear, in percent of the buying price
+        :param created_at: time the base prices were published
+        """
+        self.varieties = list(quotes)
+        self.markets = list(multipliers)
+        self.transfer_cost_pct = transfer_cost_pct
+        self.created_at = created_at or datetime.now()
+        self._market_index = {market.lower(): index for index, market in enumerate(self.markets)}
+
+        level = np.array([multipliers[market] for market in self.markets], dtype=float)
+        quoted = np.array([float(quotes[variety].get('consensus_price') or quotes[variety]['price'])
+                           for variety in self.varieties], dtype=float)
+        # A quote from a known market is brought back to the base market's level first
+        quote_level = np.array([self._level_of(quotes[variety].get('market'), level) for variety in self.varieties])
+        self.base = quoted / quote_level if len(quoted) else quoted
+
+        self.modelled = np.outer(self.base, level)
+        self.observed = np.full(self.modelled.shape, np.nan)
+        for row, variety in enumerate(self.varieties):
+            for market, price in (observed or {}).get(variety, {}).items():
+                column = self.market_index(market)
+                if column is not None and price:
+                    self.observed[row, column] = price
+        self.prices = np.where(np.isnan(self.observed), self.modelled, self.observed).round(2)
+
+        self._regions = self._build_regions(quotes)
+        self._spreads = self._build_spreads()
+        self._arbitrage = self._build_arbitrage()
+
+    def market_index(self, market: Optional[str]) -> Optional[int]:
+        """Column of a market, matching case-insensitively and by name within longer labels ('Nizamabad Main Market')"""
+        if not market:
+            return None
+        name = market.lower()
+        if name in self._market_index:
+            return self._market_index[name]
+        return next((index for known, index in self._market_index.items() if known in name), None)
+
+    def _level_of(self, market, level):
+        column = self.market_index(market)
+        return level[column] if column is not None else 1.0
+
+    def _build_regions(self, quotes):
+        adjustment = (self.prices / self.base[:, None] - 1) * 100 if len(self.base) else self.prices
+        return {
+            market: {
+                variety: {
+                    **quotes[variety],
+                    'price': float(self.prices[row, column]),
+                    'market': market,
+                    'region': market,
+                    'regional_adjustment': f"{adjustment[row, column]:+.1f}%",
+                    'observed': bool(not np.isnan(self.observed[row, column]))
+                }
+                for row, variety in enumerate(self.varieties)
+            }
+            for column, market in enumerate(self.markets)
+        }
+
+    def _build_spreads(self):
+        if not self.varieties or not self.markets:
+            return {}
+        low, high = self.prices.argmin(axis=1), self.prices.argmax(axis=1)
+        rows = np.arange(len(self.varieties))
+        low_price, high_price = self.prices[rows, low], self.prices[rows, high]
+        spread = high_price - low_price
+        spread_pct = spread / low_price * 100
+        return {
+            variety: {
+                'low': {'market': self.markets[low[row]], 'price': float(low_price[row])},
+                'high': {'market': self.markets[high[row]], 'price': float(high_price[row])},
+                'spread': round(float(spread[row]), 2),
+                'spread_pct': round(float(spread_pct[row]), 2),
+                'mean': round(float(self.prices[row].mean()), 2)
+            }
+            for row, variety in enumerate(self.varieties)
+        }
+
+    def _build_arbitrage(self):
+        """Every (variety, buy market, sell market) whose margin clears the transfer cost, best first"""
+        if not self.varieties or not self.markets:
+            return []
+        # margin[v, buy, sell] for every pair of markets at once
+        margin = (self.prices[:, None, :] / self.prices[:, :, None] - 1) * 100 - self.transfer_cost_pct
+        rows, buys, sells = np.nonzero(margin > 0)
+        order = np.argsort(-margin[rows, buys, sells], kind='stable')
+        return [
+            {
+                'variety': self.varieties[rows[i]],
+                'buy_market': self.markets[buys[i]],
+                'buy_price': float(self.prices[rows[i], buys[i]]),
+                'sell_market': self.markets[sells[i]],
+                'sell_price': float(self.prices[rows[i], sells[i]]),
+                'gross_margin_pct': round(float(margin[rows[i], buys[i], sells[i]] + self.transfer_cost_pct), 2),
+                'net_margin_pct': round(float(margin[rows[i], buys[i], sells[i]]), 2),
+                'observed': bool(not np.isnan(self.observed[rows[i], buys[i]])
+                                 and not np.isnan(self.observed[rows[i], sells[i]]))
+            }
+            for i in order
+        ]
+
+    def region(self, market: str) -> Optional[Dict]:
+        """Every variety's price in one market, or None for an unknown market"""
+        column = self.market_index(market)
+        return self._regions[self.markets[column]] if column is not None else None
+
+    def regions(self, markets: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """region() for several markets"""
+        return {market: self.region(market) for market in markets}
+
+    def spreads(self) -> Dict:
+        """Per variety: cheapest and dearest market, absolute and relative spread"""
+        return self._spreads
+
+    def arbitrage(self, variety: Optional[str] = None, min_margin_pct: float = 0.0, limit: int = 20) -> List[Dict]:
+        """Buy-low/sell-high market pairs whose net margin exceeds min_margin_pct, best first"""
+        matches = (
+            opportunity for opportunity in self._arbitrage
+            if (variety is None or opportunity['variety'] == variety) and opportunity['net_margin_pct'] > min_margin_pct
+        )
+        return [opportunity for _, opportunity in zip(range(limit), matches)]
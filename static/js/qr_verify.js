@@ -2,6 +2,17 @@ document.addEventListener('DOMContentLoaded', function() {
     let html5QrCode = null;
     let isScanning = false;
 
+    // Signed QR codes (AGT1.<key id>.<payload>.<signature>) are verified on the device
+    const SIGNED_QR_PREFIX = 'AGT1.';
+    const PUBLIC_KEY_URL = '/api/traceability/public_key';
+    const PUBLIC_KEY_STORAGE = 'agritech-qr-public-key';
+
+    // Register the service worker so the verifier and signing key work offline
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js')
+            .catch(error => console.log('Service Worker registration failed:', error));
+    }
+
     // Initialize QR scanner
     initializeQRScanner();
 
@@ -249,6 +260,23 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show loading
         showLoading('Verifying QR code...');
 
+        if (qrData.startsWith(SIGNED_QR_PREFIX)) {
+            try {
+                const payload = await verifySignedOffline(qrData);
+                if (!payload) {
+                    showError('Invalid signature - this QR code may have been tampered with.');
+                    return;
+                }
+                displayVerificationResults({ ...payload, supply_chain: payload }, true);
+                document.getElementById('verification-status').innerHTML +=
+                    ' <small>(signature checked on this device)</small>';
+                return;
+            } catch (error) {
+                // No Ed25519 support or no key yet - let the server verify it
+                console.log('Offline verification unavailable, using server:', error);
+            }
+        }
+
         try {
             // Try to verify as encrypted data first
             const verifyResponse = await fetch('/api/verify_qr', {
@@ -273,6 +301,56 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    async function getPublicKeyInfo(keyId) {
+        const stored = localStorage.getItem(PUBLIC_KEY_STORAGE);
+        if (stored) {
+            const keyInfo = JSON.parse(stored);
+            if (keyInfo.key_id === keyId) {
+                return keyInfo;
+            }
+        }
+
+        // Unknown key: fetch it (served by the service worker cache when offline)
+        const response = await fetch(PUBLIC_KEY_URL);
+        if (!response.ok) {
+            throw new Error('Signing key unavailable');
+        }
+        const keyInfo = await response.json();
+        localStorage.setItem(PUBLIC_KEY_STORAGE, JSON.stringify(keyInfo));
+        return keyInfo;
+    }
+
+    function base64UrlToBytes(text) {
+        const base64 = text.replace(/-/g, '+').replace(/_/g, '/') + '='.repeat((4 - text.length % 4) % 4);
+        return Uint8Array.from(atob(base64), c => c.charCodeAt(0));
+    }
+
+    async function verifySignedOffline(token) {
+        // Returns the payload, or null if the signature is invalid
+        const parts = token.split('.');
+        if (parts.length !== 4) {
+            return null;
+        }
+        const [prefix, keyId, payload, signature] = parts;
+
+        const keyInfo = await getPublicKeyInfo(keyId);
+        if (keyInfo.key_id !== keyId) {
+            return null;
+        }
+
+        const key = await crypto.subtle.importKey(
+            'raw', base64UrlToBytes(keyInfo.public_key), { name: 'Ed25519' }, false, ['verify']
+        );
+        const valid = await crypto.subtle.verify(
+            { name: 'Ed25519' }, key, base64UrlToBytes(signature),
+            new TextEncoder().encode(`${prefix}.${keyId}.${payload}`)
+        );
+        if (!valid) {
+            return null;
+        }
+        return JSON.parse(new TextDecoder().decode(base64UrlToBytes(payload)));
+    }
+
     async function verifyBatchManually() {
         const batchId = document.getElementById('batch-id-input').value.trim();
         if (!batchId) {
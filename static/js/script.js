@@ -1,7 +1,7 @@
 document.addEventListener('DOMContentLoaded', function() {
     // Register service worker for offline functionality
     if ('serviceWorker' in navigator) {
-        navigator.serviceWorker.register('/static/js/sw.js')
+        navigator.serviceWorker.register('/sw.js')
             .then(registration => {
                 console.log('Service Worker registered:', registration);
             })
@@ -34,8 +34,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Enhanced trade form event listeners
     setupTradeFormListeners();
 
-    // Auto-refresh chart every 30 seconds
-    setInterval(loadMarketPrices, 30000);
+    // Live price updates pushed by the server (falls back to 30-second polling)
+    startPriceStream();
 
     // Smooth scrolling for navigation
     document.querySelectorAll('a[href^="#"]').forEach(anchor => {
@@ -282,58 +282,53 @@ function initializePriceChart() {
     });
 }
 
-function loadMarketPrices() {
-    fetch('/market_prices')
-        .then(response => response.json())
-        .then(data => {
-            const pricesDiv = document.getElementById('prices');
-            const lastUpdatedDiv = document.getElementById('last-updated');
+const PRICE_POLL_INTERVAL = 30000;
+let pricePollTimer = null;
 
-            // Update last updated time
-            if (data.last_updated) {
-                const date = new Date(data.last_updated);
-                lastUpdatedDiv.textContent = `Last updated: ${date.toLocaleString()} | Sources: ${data.sources.join(', ')}`;
-            }
+function startPricePolling() {
+    if (!pricePollTimer) {
+        pricePollTimer = setInterval(loadMarketPrices, PRICE_POLL_INTERVAL);
+    }
+}
 
-            pricesDiv.innerHTML = '';
+function stopPricePolling() {
+    clearInterval(pricePollTimer);
+    pricePollTimer = null;
+}
 
-            if (data.prices) {
-                // Update chart with historical data
-                updatePriceChart(data);
+function startPriceStream() {
+    if (!('EventSource' in window)) {
+        startPricePolling();
+        return;
+    }
 
-                // Update market indicators
-                updateMarketIndicators(data);
+    const stream = new EventSource('/market_prices/stream');
+    stream.addEventListener('open', stopPricePolling);
+    stream.addEventListener('snapshot', event => renderMarketPrices(JSON.parse(event.data)));
+    stream.addEventListener('delta', event => applyPriceDelta(JSON.parse(event.data)));
+    stream.addEventListener('error', () => {
+        // The browser reconnects on its own; poll until it does
+        startPricePolling();
+    });
+}
 
-                for (const [crop, info] of Object.entries(data.prices)) {
-                    const card = document.createElement('div');
-                    card.className = `price-card ${info.trend === 'up' ? 'trending-up' : info.trend === 'down' ? 'trending-down' : ''}`;
+function applyPriceDelta(delta) {
+    const data = window.marketPricesData;
+    if (!data || !data.prices) {
+        loadMarketPrices();
+        return;
+    }
 
-                    // Determine trend color
-                    let trendColor = '#666';
-                    let trendSymbol = '→';
-                    if (info.trend === 'up') {
-                        trendColor = '#28a745';
-                        trendSymbol = '↗';
-                    } else if (info.trend === 'down') {
-                        trendColor = '#dc3545';
-                        trendSymbol = '↘';
-                    }
+    Object.assign(data.prices, delta.changed);
+    delta.removed.forEach(variety => delete data.prices[variety]);
+    data.last_updated = new Date().toISOString();
+    renderMarketPrices(data);
+}
 
-                    card.innerHTML = `
-                        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
-                            <h3>₹${info.price}</h3>
-                            <span style="color: ${trendColor}; font-size: 1.2rem;">${trendSymbol}</span>
-                        </div>
-                        <p style="margin: 0.25rem 0; color: #666; font-size: 0.9rem;">${crop.charAt(0).toUpperCase() + crop.slice(1)} (${info.unit})</p>
-                        <p style="margin: 0; color: #888; font-size: 0.8rem;">${info.source} • ${info.market || 'Regional'}</p>
-                        ${info.change_percent ? `<span class="price-change ${info.change_percent > 0 ? 'positive' : 'negative'}">${info.change_percent > 0 ? '+' : ''}${info.change_percent}%</span>` : ''}
-                    `;
-                    pricesDiv.appendChild(card);
-                }
-            } else {
-                pricesDiv.innerHTML = '<p>No price data available at the moment.</p>';
-            }
-        })
+function loadMarketPrices() {
+    fetch('/market_prices')
+        .then(response => response.json())
+        .then(renderMarketPrices)
         .catch(error => {
             console.error('Error loading market prices:', error);
             document.getElementById('prices').innerHTML = '<p>Error loading prices. Please try again.</p>';
@@ -341,6 +336,57 @@ function loadMarketPrices() {
         });
 }
 
+function renderMarketPrices(data) {
+    window.marketPricesData = data;
+    const pricesDiv = document.getElementById('prices');
+    const lastUpdatedDiv = document.getElementById('last-updated');
+
+    // Update last updated time
+    if (data.last_updated) {
+        const date = new Date(data.last_updated);
+        lastUpdatedDiv.textContent = `Last updated: ${date.toLocaleString()} | Sources: ${data.sources.join(', ')}`;
+    }
+
+    pricesDiv.innerHTML = '';
+
+    if (data.prices) {
+        // Update chart with historical data
+        updatePriceChart(data);
+
+        // Update market indicators
+        updateMarketIndicators(data);
+
+        for (const [crop, info] of Object.entries(data.prices)) {
+            const card = document.createElement('div');
+            card.className = `price-card ${info.trend === 'up' ? 'trending-up' : info.trend === 'down' ? 'trending-down' : ''}`;
+
+            // Determine trend color
+            let trendColor = '#666';
+            let trendSymbol = '→';
+            if (info.trend === 'up') {
+                trendColor = '#28a745';
+                trendSymbol = '↗';
+            } else if (info.trend === 'down') {
+                trendColor = '#dc3545';
+                trendSymbol = '↘';
+            }
+
+            card.innerHTML = `
+                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 0.5rem;">
+                    <h3>₹${info.price}</h3>
+                    <span style="color: ${trendColor}; font-size: 1.2rem;">${trendSymbol}</span>
+                </div>
+                <p style="margin: 0.25rem 0; color: #666; font-size: 0.9rem;">${crop.charAt(0).toUpperCase() + crop.slice(1)} (${info.unit})</p>
+                <p style="margin: 0; color: #888; font-size: 0.8rem;">${info.source} • ${info.market || 'Regional'}</p>
+                ${info.change_percent ? `<span class="price-change ${info.change_percent > 0 ? 'positive' : 'negative'}">${info.change_percent > 0 ? '+' : ''}${info.change_percent}%</span>` : ''}
+            `;
+            pricesDiv.appendChild(card);
+        }
+    } else {
+        pricesDiv.innerHTML = '<p>No price data available at the moment.</p>';
+    }
+}
+
 function updatePriceChart(data) {
     if (!window.priceChart) return;
 
@@ -1,7 +1,14 @@
 // Service Worker for offline functionality
-const CACHE_NAME = 'agritech-v1';
-const STATIC_CACHE = 'agritech-static-v1';
-const DYNAMIC_CACHE = 'agritech-dynamic-v1';
+const CACHE_NAME = 'agritech-v2';
+const STATIC_CACHE = 'agritech-static-v2';
+const DYNAMIC_CACHE = 'agritech-dynamic-v2';
+
+// Public key for verifying signed QR codes without a server round-trip
+const PUBLIC_KEY_URL = '/api/traceability/public_key';
+const OFFLINE_VERIFY_FILES = [
+    PUBLIC_KEY_URL,
+    '/static/js/qr_verify.js'
+];
 
 // Files to cache immediately
 const STATIC_FILES = [
@@ -20,7 +27,11 @@ self.addEventListener('install', event => {
         caches.open(STATIC_CACHE)
             .then(cache => {
                 console.log('Service Worker: Caching static files');
-                return cache.addAll(STATIC_FILES);
+                // Cached separately so a missing static file cannot block offline QR verification
+                return Promise.all([
+                    cache.addAll(OFFLINE_VERIFY_FILES),
+                    cache.addAll(STATIC_FILES)
+                ]);
             })
             .catch(error => {
                 console.log('Service Worker: Error caching static files', error);
@@ -52,6 +63,11 @@ self.addEventListener('fetch', event => {
     const { request } = event;
     const url = new URL(request.url);
 
+    // Server-sent event streams never end, so they can't be cloned into a cache; let the browser handle them
+    if (request.headers.get('Accept') === 'text/event-stream' || url.pathname === '/market_prices/stream') {
+        return;
+    }
+
     // Handle API calls differently
     if (url.pathname.startsWith('/market_prices') ||
         url.pathname.startsWith('/market_intelligence')) {
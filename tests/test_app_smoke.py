@@ -0,0 +1,56 @@
+"""
+Import and smoke-test the Flask app against replayed market data (no network access needed).
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from market_transport import DEFAULT_FIXTURE_DIR, ReplayServer
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('app')
+    server = ReplayServer(DEFAULT_FIXTURE_DIR, seed=42).start()
+    previous_dir = os.getcwd()
+    # users.db, the blockchain and key files are created relative to the working directory
+    os.chdir(workdir)
+    os.environ.update({
+        'MARKET_TRANSPORT': 'replay',
+        'MARKET_REPLAY_URL': server.url,
+        'PRICE_DB_PATH': str(workdir / 'prices.db'),
+        'TRACEABILITY_KEY_FILE': str(workdir / 'traceability_keys.json')
+    })
+    try:
+        from app import app
+        yield app.test_client()
+    finally:
+        os.chdir(previous_dir)
+        server.stop()
+
+def test_market_prices(client):
+    response = client.get('/market_prices')
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+
+    revalidated = client.get('/market_prices', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+@pytest.mark.parametrize('path', ['/', '/chain', '/market_intelligence', '/price_history/turmeric',
+                                  '/regional_prices/Nizamabad', '/api/all_sources'])
+def test_routes_respond(client, path):
+    assert client.get(path).status_code == 200
+
+def test_qr_server_timing(client):
+    response = client.get('/generate_qr/batch_001')
+    assert response.status_code == 200
+    assert 'qr-total;dur=' in response.headers['Server-Timing']
+
+@pytest.mark.parametrize('payload', [12345, 'not-a-token', ['a']])
+def test_verify_qr_rejects_invalid_payloads(client, payload):
+    assert client.post('/api/verify_qr', json={'encrypted_data': payload}).status_code == 400
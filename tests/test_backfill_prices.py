@@ -0,0 +1,96 @@
+"""
+Backfilling daily bars from price dumps: chunk boundaries, resumes and reloads.
+
+Usage: python -m pytest tests
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from backfill_prices import PriceBackfill
+from price_store import PriceStore
+
+# Two days at Erode: the first has a row repeated verbatim and a grade name in a quoted
+# multi-line field, so chunks and offsets must follow records rather than lines
+DUMP = '''Market,Commodity,Variety,Arrival_Date,Min_Price,Max_Price,Modal_Price,Arrivals
+Erode,Turmeric,Erode Finger,01/03/2024,9000,10500,10000,20
+Erode,Turmeric,"Erode
+(Bulb)",01/03/2024,10000,11500,11000,30
+Erode,Turmeric,Erode Finger,01/03/2024,9000,10500,10000,20
+Erode,Rice,Sona,01/03/2024,3000,3500,3200,90
+Erode,Turmeric,Erode Bulb,02/03/2024,8500,9500,9000,15
+Erode,Turmeric,Erode Finger,02/03/2024,9200,10800,10400,25
+'''
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / 'erode.csv'
+    path.write_text(DUMP, encoding='utf-8')
+    return str(path)
+
+def _bars(store):
+    return [(bar['period'], bar['open'], bar['high'], bar['low'], bar['close'], bar['volume'], bar['samples'])
+            for bar in store.downsample('erode', market='Erode')]
+
+def _load(tmp_path, name, paths, chunksize):
+    store = PriceStore(str(tmp_path / name))
+    backfill = PriceBackfill(store, chunksize=chunksize)
+    for path in paths:
+        backfill.backfill(path)
+    return store
+
+def test_bars_do_not_depend_on_chunk_boundaries(tmp_path, dump):
+    expected = _bars(_load(tmp_path, 'whole.db', [dump], chunksize=100))
+    assert expected
+    for chunksize in (1, 2, 3):
+        assert _bars(_load(tmp_path, f'chunks{chunksize}.db', [dump], chunksize)) == expected
+
+def test_duplicate_rows_count_once(tmp_path, dump):
+    store = _load(tmp_path, 'prices.db', [dump], chunksize=1)
+    first_day, second_day = store.downsample('erode')
+    assert (first_day['period'], first_day['volume'], first_day['samples']) == ('2024-03-01', 50, 2)
+    assert (first_day['open'], first_day['high'], first_day['low'], first_day['close']) == (100, 115, 90, 110)
+    assert (second_day['volume'], second_day['samples']) == (40, 2)
+
+def test_reloading_a_copy_changes_nothing(tmp_path, dump):
+    copy = str(tmp_path / 'erode_copy.csv')
+    shutil.copy(dump, copy)
+
+    expected = _bars(_load(tmp_path, 'once.db', [dump], chunksize=2))
+    store = _load(tmp_path, 'twice.db', [dump, copy], chunksize=2)
+    version = store.version
+
+    assert _bars(store) == expected
+    assert PriceBackfill(store, chunksize=3).backfill(copy)['skipped']
+    assert store.version == version
+
+def test_resume_after_crash_matches_a_clean_run(tmp_path, dump, monkeypatch):
+    expected = _bars(_load(tmp_path, 'clean.db', [dump], chunksize=100))
+
+    store = PriceStore(str(tmp_path / 'crashed.db'))
+    record = store.record_daily_bars
+    calls = []
+
+    def crash_on_third_chunk(bars, conn=None):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError('killed')
+        return record(bars, conn)
+
+    monkeypatch.setattr(store, 'record_daily_bars', crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        PriceBackfill(store, chunksize=1).backfill(dump)
+    monkeypatch.undo()
+
+    backfill = PriceBackfill(store, chunksize=1)
+    checkpoint = backfill._checkpoint(os.path.abspath(dump), os.stat(dump))
+    assert checkpoint['rows_done'] == 2 and checkpoint['offset'] > 0
+
+    result = backfill.backfill(dump)
+    assert result['rows'] == 4
+    assert _bars(store) == expected
@@ -0,0 +1,84 @@
+"""
+Circuit breaker state transitions: closed -> open -> half-open -> closed or open again.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import circuit_breaker
+from circuit_breaker import (STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, BreakerRegistry, CircuitBreaker,
+                             CircuitOpenError)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, 'monotonic', lambda: now[0])
+    return now
+
+def _fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure(RuntimeError('timeout'))
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('agmarknet', failure_threshold=3, cooldown=60)
+    _fail(breaker, 2)
+    assert breaker.state == STATE_CLOSED
+
+    _fail(breaker, 1)
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.snapshot()['rejected'] == 1
+    assert breaker.snapshot()['last_error'] == 'timeout'
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker('agmarknet', failure_threshold=3)
+    _fail(breaker, 2)
+    breaker.before_call()
+    breaker.record_success()
+    _fail(breaker, 2)
+    assert breaker.state == STATE_CLOSED
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker('agmarknet', failure_threshold=1, cooldown=60)
+    _fail(breaker, 1)
+    clock[0] += 61
+
+    assert breaker.before_call() is True
+    assert breaker.state == STATE_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.before_call() is False
+
+def test_failed_trial_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker('agmarknet', failure_threshold=3, cooldown=60)
+    _fail(breaker, 3)
+    clock[0] += 61
+
+    breaker.before_call()
+    breaker.record_failure(RuntimeError('still down'))
+    assert breaker.state == STATE_OPEN
+    assert breaker.snapshot()['retry_in'] == 60
+
+def test_registry_applies_source_overrides():
+    registry = BreakerRegistry()
+    breaker = registry.get('indian_agri_api', {'breaker': {'cooldown': 5}})
+    assert registry.get('indian_agri_api') is breaker
+    assert (breaker.failure_threshold, breaker.cooldown) == (3, 5)
+
+def test_trial_sessions_make_a_single_attempt():
+    from http_sessions import SessionPool
+    pool = SessionPool()
+    config = {'http': {'retries': 4}}
+    assert pool.session('agmarknet', config).get_adapter('https://').max_retries.total == 4
+    assert pool.session('agmarknet', config, retries=False).get_adapter('https://').max_retries.total == 0
@@ -0,0 +1,70 @@
+"""
+Key rotation across key store instances sharing one key file (as separate workers do).
+
+Usage: python -m pytest tests
+"""
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from key_store import TraceabilityKeyStore
+from traceability import TraceabilitySystem
+
+def _bump_mtime(path):
+    # Make sure a rewrite within the filesystem's timestamp resolution is still seen as a change
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def test_rotation_keeps_old_keys_for_decryption(tmp_path):
+    store = TraceabilityKeyStore(path=str(tmp_path / 'keys.json'), max_keys=2)
+    old_token = store.cipher.encrypt(b'batch')
+
+    new_key = store.rotate()
+
+    assert store.current_key == new_key
+    assert store.cipher.decrypt(old_token) == b'batch'
+    store.rotate()
+    store.rotate()
+    assert len(store.keys) == 2
+
+def test_rotation_keeps_keys_added_by_another_worker(tmp_path):
+    path = str(tmp_path / 'keys.json')
+    first = TraceabilityKeyStore(path=path)
+    second = TraceabilityKeyStore(path=path)
+
+    first_key = first.rotate()
+    _bump_mtime(path)
+    second_key = second.rotate()
+
+    with open(path, encoding='utf-8') as f:
+        on_disk = json.load(f)['fernet_keys']
+    assert on_disk[:2] == [second_key.decode(), first_key.decode()]
+
+def test_legacy_key_file_gets_one_signing_key(tmp_path):
+    path = str(tmp_path / 'keys.json')
+    TraceabilityKeyStore(path=path)
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    del data['signing_key']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+    first = TraceabilityKeyStore(path=path)
+    second = TraceabilityKeyStore(path=path)
+    assert first.key_id == second.key_id
+
+def test_encrypt_picks_up_rotation_by_another_worker(tmp_path):
+    path = str(tmp_path / 'keys.json')
+    traceability = TraceabilitySystem(key_store=TraceabilityKeyStore(path=path))
+    traceability.build_qr({'batch_id': 'b1'})
+
+    new_key = TraceabilityKeyStore(path=path).rotate()
+    _bump_mtime(path)
+    # Let the throttled check run on the next encryption
+    traceability.key_store._checked_at = 0.0
+    traceability.build_qr({'batch_id': 'b1'})
+
+    assert traceability.key_store.current_key == new_key
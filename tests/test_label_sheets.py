@@ -0,0 +1,73 @@
+"""
+Streaming PDF label sheets: layout, cross-reference table and lazy label rendering.
+
+Usage: python -m pytest tests
+"""
+import os
+import re
+import sys
+
+import pytest
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from key_store import TraceabilityKeyStore
+from label_sheets import LabelSheetPDF, render_labels
+from traceability import TraceabilitySystem
+
+def _labels(count, rendered):
+    for index in range(count):
+        rendered.append(index)
+        yield Image.new('L', (64, 64), color=255 if index % 2 else 0)
+
+def _check_xref(pdf):
+    """Every xref offset points at its object, and startxref at the xref table"""
+    startxref = int(re.search(rb'startxref\n(\d+)\n%%EOF', pdf).group(1))
+    assert pdf[startxref:].startswith(b'xref\n')
+    size = int(re.search(rb'xref\n0 (\d+)\n', pdf).group(1))
+    offsets = re.findall(rb'(\d{10}) 00000 n \n', pdf)
+    assert len(offsets) == size - 1
+    for obj_id, offset in enumerate(offsets, start=1):
+        assert pdf[int(offset):].startswith(f'{obj_id} 0 obj\n'.encode())
+
+def test_labels_are_laid_out_n_per_page():
+    sheet = LabelSheetPDF(columns=2, rows=2)
+    pdf = b''.join(sheet.stream(_labels(5, [])))
+
+    assert pdf.startswith(b'%PDF-1.4')
+    assert b'/Count 2' in pdf
+    assert len(re.findall(rb'/Subtype /Image', pdf)) == 5
+    _check_xref(pdf)
+
+def test_empty_sheet_still_has_one_page():
+    pdf = b''.join(LabelSheetPDF().stream([]))
+    assert b'/Count 1' in pdf
+    _check_xref(pdf)
+
+def test_labels_are_rendered_while_streaming():
+    rendered = []
+    chunks = LabelSheetPDF(columns=1, rows=1).stream(_labels(10, rendered))
+
+    # Header, catalog and the first label image: nothing past the first label rendered yet
+    for _ in range(3):
+        next(chunks)
+    assert rendered == [0]
+    list(chunks)
+    assert rendered == list(range(10))
+
+def test_grid_must_fit_the_page():
+    with pytest.raises(ValueError):
+        LabelSheetPDF(columns=100, rows=1, gutter=12)
+    with pytest.raises(ValueError):
+        LabelSheetPDF(page_size='B5')
+
+def test_rendered_qr_labels(tmp_path):
+    traceability = TraceabilitySystem(key_store=TraceabilityKeyStore(path=str(tmp_path / 'keys.json')))
+    batches = [{'batch_id': f'b{index}', 'crop_type': 'turmeric'} for index in range(3)]
+
+    pdf = b''.join(LabelSheetPDF().stream(render_labels(traceability, batches, 'signed')))
+
+    assert len(re.findall(rb'/BitsPerComponent 1', pdf)) == 3
+    _check_xref(pdf)
@@ -0,0 +1,63 @@
+"""
+Streaming spike/drop detection on refreshed quotes.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from price_anomalies import AnomalyDetector, describe_alert
+
+START = datetime(2026, 3, 1, 9)
+
+def _feed(detector, prices, source='agmarknet', market='Nizamabad'):
+    """Feed one quote per hour; return every alert raised"""
+    raised = []
+    for hour, price in enumerate(prices):
+        observed_at = START + timedelta(hours=hour)
+        quote = {'price': price, 'market': market, 'source': 'Agmarknet', 'last_updated': observed_at.isoformat()}
+        raised.extend(detector.update(source, {'nizamabad': quote}, observed_at))
+    return raised
+
+def test_spike_and_drop_are_alerted():
+    detector = AnomalyDetector()
+    steady = [100.0, 101.0, 99.5, 100.5, 100.0, 99.8, 100.2]
+
+    [spike] = _feed(detector, steady + [130.0])
+    assert (spike['type'], spike['variety'], spike['market']) == ('spike', 'nizamabad', 'Nizamabad')
+    assert spike['change_pct'] > 25 and spike['z_score'] >= 3
+
+    [drop] = _feed(AnomalyDetector(), steady + [70.0])
+    assert drop['type'] == 'drop'
+    assert 'drop at Nizamabad' in describe_alert(drop)
+
+def test_normal_noise_and_warmup_raise_nothing():
+    assert _feed(AnomalyDetector(), [100.0, 101.0, 99.5, 100.5, 100.0, 99.8, 100.2, 100.9, 99.4]) == []
+    # A jump before warmup has passed isn't scored
+    assert _feed(AnomalyDetector(warmup=5), [100.0, 100.0, 150.0]) == []
+
+def test_small_moves_on_a_flat_series_are_not_alerts():
+    # A perfectly flat series has zero variance; the std floor and minimum change keep 1% moves quiet
+    assert _feed(AnomalyDetector(), [100.0] * 10 + [101.0]) == []
+
+def test_refetched_and_placeholder_quotes_are_skipped():
+    detector = AnomalyDetector()
+    quote = {'price': 100.0, 'market': 'Erode', 'last_updated': START.isoformat()}
+    for _ in range(3):
+        detector.update('agmarknet', {'erode': quote})
+    detector.update('agmarknet', {'erode': {'price': 500.0, 'market': 'Erode', 'source': 'Fallback data'}})
+
+    [stats] = detector.stats('erode')
+    assert (stats['observations'], stats['mean']) == (1, 100.0)
+
+def test_alerts_expire():
+    detector = AnomalyDetector(alert_ttl=3600)
+    _feed(detector, [100.0, 101.0, 99.5, 100.5, 100.0, 99.8, 100.2, 130.0])
+    detected_at = START + timedelta(hours=7)
+
+    assert len(detector.alerts(now=detected_at + timedelta(minutes=30))) == 1
+    assert detector.alerts(now=detected_at + timedelta(hours=2)) == []
@@ -0,0 +1,73 @@
+"""
+Batch price forecasting: the vectorized models, model selection and procurement predictions.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import procurement
+from price_forecasting import (HORIZONS, MODELS, PriceForecaster, holt_forecast, linear_trend_forecast,
+                               naive_forecast, seasonal_naive_forecast)
+from price_store import PriceStore
+
+def test_models_forecast_every_series_at_once():
+    days = np.arange(28, dtype=float)
+    matrix = np.column_stack([100 + 2 * days, 100 + 10 * (days % 7 == 0), np.full(28, 50.0)])
+    matrix[-3:, 2] = np.nan  # a series whose last days are missing
+    steps = np.array([1, 7])
+
+    assert np.allclose(linear_trend_forecast(matrix, steps)[:, 0], [100 + 2 * 28, 100 + 2 * 34])
+    assert np.allclose(seasonal_naive_forecast(matrix, steps)[:, 1], [110, 100])
+    assert np.allclose(naive_forecast(matrix, steps)[:, 2], [50, 50])
+    for model in MODELS.values():
+        assert model(matrix, steps).shape == (2, 3)
+
+def test_holt_follows_a_trend():
+    matrix = (100 + np.arange(60, dtype=float))[:, None]
+    forecast = holt_forecast(matrix, np.array([1, 7]))[:, 0]
+    assert 155 < forecast[0] < forecast[1] < 170
+
+def _store(tmp_path, series):
+    """PriceStore with one daily bar per day of each (variety, market) -> closes list, ending today"""
+    store = PriceStore(str(tmp_path / 'prices.db'))
+    bars = []
+    for (variety, market), closes in series.items():
+        for age, close in enumerate(reversed(closes)):
+            day = (date.today() - timedelta(days=age)).isoformat()
+            bars.append(('agmarknet', variety, market, day, close, close, close, close, None, 1))
+    store.record_daily_bars(bars)
+    return store
+
+def test_forecaster_picks_the_best_model_per_series(tmp_path):
+    trend = [100.0 + day for day in range(60)]
+    store = _store(tmp_path, {('erode', 'Erode'): trend, ('nizamabad', 'Nizamabad'): [100.0] * 5})
+    forecaster = PriceForecaster(store=store)
+
+    result = forecaster.forecasts()
+    erode = forecaster.forecast('erode')
+
+    assert set(result['series']) == {'erode'}  # too few observations for nizamabad
+    assert erode['model'] == 'linear_trend'
+    assert erode['forecast']['next_week'] == pytest.approx(159 + HORIZONS['next_week'], abs=0.01)
+    assert erode['error']['mape'] == pytest.approx(0, abs=0.01)
+    assert forecaster.forecasts() is result  # cached until the store changes
+
+def test_procurement_predictions_skip_proxy_markets(tmp_path, monkeypatch):
+    rising = [100.0 + day for day in range(60)]
+    falling = [500.0 - day for day in range(60)]
+    store = _store(tmp_path, {('erode', 'Erode'): rising, ('nizamabad', 'Global Commodity'): falling})
+    monkeypatch.setattr(procurement, 'get_price_forecaster', lambda: PriceForecaster(store=store))
+
+    predictions = procurement.price_predictions()
+
+    assert predictions['turmeric']['series'] == 1
+    assert predictions['turmeric']['next_week'].startswith('+')
+    assert predictions['rice'] == procurement.DEFAULT_PRICE_PREDICTIONS['rice']
@@ -0,0 +1,59 @@
+"""
+Price store retention: rolling raw quotes up into daily bars.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from price_store import PriceStore
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / 'prices.db'), raw_retention_days=30, daily_retention_days=365)
+
+def _quotes(day, prices):
+    return [{'price': price, 'market': 'Erode', 'volume': 10, 'source': 'Agmarknet',
+             'last_updated': datetime.combine(day, datetime.min.time()).replace(hour=hour).isoformat()}
+            for hour, price in prices]
+
+def test_retention_rolls_old_quotes_into_daily_bars(store):
+    day = date.today() - timedelta(days=40)
+    for quote in _quotes(day, [(9, 100.0), (12, 110.0), (15, 105.0)]):
+        store.record_quotes('agmarknet', {'erode_turmeric': quote})
+
+    store.apply_retention()
+
+    assert store.query('erode_turmeric') == []
+    [bar] = store.downsample('erode_turmeric', start=day, end=day)
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (100.0, 110.0, 100.0, 105.0)
+    assert (bar['volume'], bar['samples']) == (30, 3)
+
+def test_retention_merges_quotes_into_an_existing_bar(store):
+    day = date.today() - timedelta(days=40)
+    store.record_daily_bars([('agmarknet', 'erode_turmeric', 'Erode', day.isoformat(),
+                              90.0, 95.0, 85.0, 92.0, 50, 2)])
+    version = store.version
+
+    for quote in _quotes(day, [(12, 120.0), (15, 80.0)]):
+        store.record_quotes('agmarknet', {'erode_turmeric': quote})
+    store.apply_retention()
+
+    [bar] = store.downsample('erode_turmeric', start=day, end=day)
+    assert (bar['high'], bar['low'], bar['close']) == (120.0, 80.0, 80.0)
+    assert (bar['volume'], bar['samples']) == (70, 4)
+    assert store.version > version
+
+def test_retention_deletes_expired_bars(store):
+    expired = date.today() - timedelta(days=400)
+    store.record_daily_bars([('agmarknet', 'erode_turmeric', 'Erode', expired.isoformat(),
+                              90.0, 95.0, 85.0, 92.0, None, 1)])
+
+    assert store.apply_retention()['daily_bars_deleted'] == 1
+    assert store.downsample('erode_turmeric', start=expired, end=expired) == []
@@ -0,0 +1,67 @@
+"""
+TTLCache single-flight loading and the market data cache lifetimes built on it.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from ttl_cache import TTLCache
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('key', loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def failing():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('key', failing)
+    assert cache.get_or_load('key', lambda: 'value') == 'value'
+
+def test_ttl_callable_sets_entry_lifetime():
+    cache = TTLCache(ttl=60)
+    cache.get_or_load('empty', lambda: {}, ttl=lambda value: 0 if not value else 60)
+    assert cache.get('empty', 'expired') == 'expired'
+
+@pytest.fixture(scope='module')
+def service():
+    from market_data import MarketDataService
+    return MarketDataService()
+
+@pytest.mark.parametrize('data', [{}, [], None, {'error': 'timeout'},
+                                  {'error': 'HTTP 500', 'status': 'error', 'prices': {'x': 1}},
+                                  {'prices': {}, 'source': 'Indian Agri API'}])
+def test_empty_and_error_results_cached_briefly(service, data):
+    assert service._cache_ttl('indian_agri_api', data) == service.empty_cache_ttl
+
+def test_results_with_prices_use_source_ttl(service):
+    ttl = service._cache_ttl('indian_agri_api', {'prices': {'Salem Turmeric': {'price': 120}}})
+    assert ttl > service.empty_cache_ttl
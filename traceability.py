@@ -1,105 +1,366 @@
 import qrcode
 import json
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import InvalidToken
 from PIL import Image, ImageDraw, ImageFont
 import io
 import base64
+import hashlib
 from datetime import datetime
+from functools import lru_cache
+from time import perf_counter
+from xml.sax.saxutils import escape
+from key_store import TraceabilityKeyStore
+from ttl_cache import TTLCache
+
+# QR payload modes: Fernet-encrypted (server verification) or Ed25519-signed (offline verification)
+QR_MODE_ENCRYPTED = 'encrypted'
+QR_MODE_SIGNED = 'signed'
+QR_MODES = (QR_MODE_ENCRYPTED, QR_MODE_SIGNED)
+
+# Output formats and their content types
+QR_FORMAT_PNG = 'png'        # grayscale PNG, default compression
+QR_FORMAT_PNG_1BIT = 'png1'  # 1-bit PNG, maximum compression
+QR_FORMAT_SVG = 'svg'        # vector output, never rasterized
+QR_FORMATS = {
+    QR_FORMAT_PNG: 'image/png',
+    QR_FORMAT_PNG_1BIT: 'image/png',
+    QR_FORMAT_SVG: 'image/svg+xml'
+}
+
+# Branding margin around the QR, in pixels (5 modules at the default box size)
+BRANDING_MARGIN = 50
+
+# Signed tokens look like AGT1.<key id>.<base64url JSON>.<base64url signature>
+SIGNED_QR_PREFIX = 'AGT1'
+
+# Seconds between key file checks when encrypting or signing, so rotations by other workers are picked up
+KEY_REFRESH_INTERVAL = 1.0
+
+def _b64url_encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """Load the branding font once per size, falling back to PIL's built-in font"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
 
 class TraceabilitySystem:
-    def __init__(self):
-        # Generate encryption key (in production, this should be stored securely)
-        self.key = Fernet.generate_key()
-        self.cipher = Fernet(self.key)
+    def __init__(self, key_store=None, cache_size=4096, cache_ttl=600):
+        # Keys are shared through a key file so any worker can verify any QR
+        self.key_store = key_store or TraceabilityKeyStore()
+        # Decrypted payloads keyed by ciphertext digest, so repeat scans skip decryption
+        self.verified_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # Pre-rendered branding frames, one per QR image size
+        self.branding_templates = {}
 
-    def generate_traceability_qr(self, batch_data, include_logo=False):
+    def generate_traceability_qr(self, batch_data, include_logo=False, mode=QR_MODE_ENCRYPTED):
         """
         Generate encrypted QR code for product traceability
         :param batch_data: dict containing supply chain information
         :param include_logo: bool to include AgriTech logo
+        :param mode: 'encrypted' (server verification) or 'signed' (offline verification)
         :return: PIL Image object
         """
-        # Encrypt the data
-        data_string = json.dumps(batch_data, sort_keys=True)
-        encrypted_data = self.cipher.encrypt(data_string.encode())
+        return self.build_qr(batch_data, include_logo, mode)['image']
+
+    def build_qr(self, batch_data, include_logo=False, mode=QR_MODE_ENCRYPTED, fmt=QR_FORMAT_PNG):
+        """
+        Run the QR pipeline once: serialize, encrypt (or sign), encode matrix, rasterize, brand.
+        Every stage result is kept so callers can reuse it instead of recomputing.
+        SVG output replaces the rasterize and brand stages with a vector render.
+        :param batch_data: dict containing supply chain information
+        :param include_logo: bool to include AgriTech branding
+        :param mode: 'encrypted' (server verification) or 'signed' (offline verification)
+        :param fmt: output format, one of QR_FORMATS
+        :return: dict with payload, token, qr, image (or svg) and per-stage timings (ms)
+        """
+        if mode not in QR_MODES:
+            raise ValueError(f"Unknown QR mode: {mode}")
+        if fmt not in QR_FORMATS:
+            raise ValueError(f"Unknown QR format: {fmt}")
+
+        timings = {}
+
+        start = perf_counter()
+        payload = self._serialize(batch_data, compact=(mode == QR_MODE_SIGNED))
+        timings['serialize'] = (perf_counter() - start) * 1000
+
+        start = perf_counter()
+        if mode == QR_MODE_SIGNED:
+            token = self._sign(payload)
+            timings['sign'] = (perf_counter() - start) * 1000
+        else:
+            token = self._encrypt(payload)
+            timings['encrypt'] = (perf_counter() - start) * 1000
+
+        start = perf_counter()
+        qr = self._encode_matrix(token)
+        timings['encode_matrix'] = (perf_counter() - start) * 1000
+
+        qr_image = None
+        svg = None
+        if fmt == QR_FORMAT_SVG:
+            start = perf_counter()
+            svg = self._render_svg(qr, batch_data if include_logo else None)
+            timings['render_svg'] = (perf_counter() - start) * 1000
+        else:
+            start = perf_counter()
+            qr_image = self._rasterize(qr)
+            timings['rasterize'] = (perf_counter() - start) * 1000
+
+            if include_logo:
+                start = perf_counter()
+                qr_image = self._add_branding(qr_image, batch_data)
+                timings['brand'] = (perf_counter() - start) * 1000
+
+        timings['total'] = sum(timings.values())
+
+        return {
+            'mode': mode,
+            'payload': payload,
+            'token': token,
+            'qr': qr,
+            'image': qr_image,
+            'svg': svg,
+            'timings': timings
+        }
+
+    def _serialize(self, batch_data, compact=False):
+        """Serialize batch data to the canonical JSON string embedded in the QR"""
+        if compact:
+            # Signed payloads travel in clear text, so keep the QR small
+            return json.dumps(batch_data, sort_keys=True, separators=(',', ':'))
+        return json.dumps(batch_data, sort_keys=True)
+
+    def _encrypt(self, payload):
+        """Encrypt the serialized payload, returning the token as a string"""
+        self.key_store.refresh(max_age=KEY_REFRESH_INTERVAL)
+        return self.cipher.encrypt(payload.encode()).decode()
+
+    def _sign(self, payload):
+        """Sign the serialized payload with the Ed25519 key, returning the token as a string"""
+        self.key_store.refresh(max_age=KEY_REFRESH_INTERVAL)
+        signed_part = f"{SIGNED_QR_PREFIX}.{self.key_store.key_id}.{_b64url_encode(payload.encode())}"
+        signature = self.key_store.signing_key.sign(signed_part.encode())
+        return f"{signed_part}.{_b64url_encode(signature)}"
+
+    def _verify_signed(self, token):
+        """
+        Check an Ed25519-signed token
+        :return: decoded payload bytes
+        """
+        prefix, key_id, payload, signature = token.split('.')
+        if key_id != self.key_store.key_id:
+            self.key_store.refresh()
+        if prefix != SIGNED_QR_PREFIX or key_id != self.key_store.key_id:
+            raise InvalidSignature(f"Unknown signing key: {key_id}")
+
+        public_key = self.key_store.signing_key.public_key()
+        public_key.verify(_b64url_decode(signature), f"{prefix}.{key_id}.{payload}".encode())
+        return _b64url_decode(payload)
+
+    def public_key_info(self):
+        """Public half of the signing key, published for offline verification"""
+        return {
+            'algorithm': 'Ed25519',
+            'key_id': self.key_store.key_id,
+            'public_key': _b64url_encode(self.key_store.public_key_bytes()),
+            'token_prefix': SIGNED_QR_PREFIX
+        }
 
-        # Create QR code
+    def _encode_matrix(self, token):
+        """Build the QR code matrix for the encrypted or signed token"""
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_H,
             box_size=10,
             border=4,
         )
-
-        # Add encrypted data
-        qr.add_data(encrypted_data.decode())
+        qr.add_data(token)
         qr.make(fit=True)
+        return qr
+
+    def _rasterize(self, qr):
+        """Render the QR matrix to a 1-bit image"""
+        return qr.make_image(fill_color="black", back_color="white").convert('1')
+
+    def _render_svg(self, qr, batch_data=None):
+        """
+        Render the QR matrix straight to SVG, one path segment per run of dark modules
+        :param batch_data: dict for branding text, or None for a bare QR
+        :return: SVG document string
+        """
+        matrix = qr.get_matrix()
+        modules = len(matrix)
+        margin = BRANDING_MARGIN / qr.box_size if batch_data is not None else 0
+        total = modules + 2 * margin
+
+        segments = []
+        for y, row in enumerate(matrix):
+            x = 0
+            while x < modules:
+                if not row[x]:
+                    x += 1
+                    continue
+                run_start = x
+                while x < modules and row[x]:
+                    x += 1
+                segments.append(f"M{run_start + margin:g} {y + margin:g}h{x - run_start}v1h-{x - run_start}z")
 
-        # Create QR code image
-        qr_image = qr.make_image(fill_color="black", back_color="white").convert('RGB')
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{total * qr.box_size:g}" height="{total * qr.box_size:g}" '
+            f'viewBox="0 0 {total:g} {total:g}" shape-rendering="crispEdges">',
+            f'<rect width="{total:g}" height="{total:g}" fill="#fff"/>',
+            f'<path d="{"".join(segments)}" fill="#000"/>'
+        ]
 
-        # Add AgriTech branding if requested
-        if include_logo:
-            qr_image = self._add_branding(qr_image, batch_data)
+        if batch_data is not None:
+            # Same layout as the raster branding, in module units
+            unit = 1 / qr.box_size
+            text = '<text x="{x:g}" y="{y:g}" font-family="Arial, sans-serif" font-size="{size:g}" text-anchor="middle" dominant-baseline="middle">{body}</text>'
+            parts.append(text.format(x=total / 2, y=20 * unit, size=20 * unit, body="AgriTech"))
+            parts.append(text.format(x=total / 2, y=total - 30 * unit, size=12 * unit,
+                                     body=escape(f"Batch: {batch_data.get('batch_id', 'N/A')}")))
+            parts.append(text.format(x=total / 2, y=total - 15 * unit, size=12 * unit, body="Scan for Traceability"))
 
-        return qr_image
+        parts.append('</svg>')
+        return ''.join(parts)
+
+    def _encode_png(self, image, fmt=QR_FORMAT_PNG):
+        """Encode a rasterized QR as PNG bytes"""
+        buffer = io.BytesIO()
+        if fmt == QR_FORMAT_PNG_1BIT:
+            if image.mode != '1':
+                image = image.point(lambda value: 255 if value >= 128 else 0, mode='1')
+            image.save(buffer, format='PNG', compress_level=9)
+        else:
+            image.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    @property
+    def key(self):
+        """Current encryption key"""
+        return self.key_store.current_key
+
+    @property
+    def cipher(self):
+        """MultiFernet over all accepted keys"""
+        return self.key_store.cipher
+
+    def _branding_template(self, qr_size):
+        """
+        Get the static branding frame for a QR of the given size, rendering it on first use
+        :param qr_size: width of the square QR image in pixels
+        :return: grayscale PIL Image with the static text drawn and the QR area blank
+        """
+        template = self.branding_templates.get(qr_size)
+        if template is None:
+            size = qr_size + 2 * BRANDING_MARGIN
+            template = Image.new('L', (size, size), 'white')
+            draw = ImageDraw.Draw(template)
+            draw.text((size//2, 20), "AgriTech", fill="black", anchor="mm", font=load_font(20))
+            draw.text((size//2, size-15), "Scan for Traceability", fill="black", anchor="mm", font=load_font(12))
+            self.branding_templates[qr_size] = template
+        return template
 
     def _add_branding(self, qr_image, batch_data):
         """Add AgriTech branding to QR code"""
-        # Create a larger canvas
-        size = qr_image.size[0] + 100
-        branded_image = Image.new('RGB', (size, size), 'white')
-        branded_image.paste(qr_image, (50, 50))
+        # Start from the pre-rendered frame; only the QR and batch line change per label
+        branded_image = self._branding_template(qr_image.size[0]).copy()
+        branded_image.paste(qr_image, (BRANDING_MARGIN, BRANDING_MARGIN))
 
-        # Add text branding
+        size = branded_image.size[0]
         draw = ImageDraw.Draw(branded_image)
-
-        # Try to use a default font, fallback to basic if not available
-        try:
-            font = ImageFont.truetype("arial.ttf", 20)
-            small_font = ImageFont.truetype("arial.ttf", 12)
-        except:
-            font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-
-        # Add AgriTech branding
-        draw.text((size//2, 20), "AgriTech", fill="black", anchor="mm", font=font)
-        draw.text((size//2, size-30), f"Batch: {batch_data.get('batch_id', 'N/A')}", fill="black", anchor="mm", font=small_font)
-        draw.text((size//2, size-15), "Scan for Traceability", fill="black", anchor="mm", font=small_font)
+        draw.text((size//2, size-30), f"Batch: {batch_data.get('batch_id', 'N/A')}", fill="black", anchor="mm", font=load_font(12))
 
         return branded_image
 
     def verify_traceability(self, encrypted_data):
         """
-        Verify and decrypt traceability data
-        :param encrypted_data: encrypted string from QR code
+        Verify and decrypt traceability data (encrypted or signed tokens)
+        Successful results are cached by ciphertext digest for repeat scans
+        :param encrypted_data: encrypted or signed string from QR code
         :return: dict with decrypted data or None if invalid
         """
+        if not isinstance(encrypted_data, str):
+            print(f"Error decrypting traceability data: expected a string, got {type(encrypted_data).__name__}")
+            return None
+
+        digest = hashlib.sha256(encrypted_data.encode()).hexdigest()
+        cached = self.verified_cache.get(digest)
+        if cached is not None:
+            # Callers annotate the result, so hand out a copy
+            return dict(cached)
+
         try:
-            decrypted = self.cipher.decrypt(encrypted_data.encode())
+            if encrypted_data.startswith(f"{SIGNED_QR_PREFIX}."):
+                decrypted = self._verify_signed(encrypted_data)
+            else:
+                try:
+                    decrypted = self.cipher.decrypt(encrypted_data.encode())
+                except InvalidToken:
+                    # Another worker may have rotated keys since we loaded them
+                    if not self.key_store.refresh():
+                        raise
+                    decrypted = self.cipher.decrypt(encrypted_data.encode())
             data = json.loads(decrypted.decode())
-            return data
+            if not isinstance(data, dict):
+                raise ValueError("payload is not a JSON object")
         except Exception as e:
             print(f"Error decrypting traceability data: {e}")
             return None
 
-    def generate_qr_data_url(self, batch_data, include_logo=False):
+        self.verified_cache.set(digest, data)
+        return dict(data)
+
+    def render_qr(self, batch_data, include_logo=False, mode=QR_MODE_ENCRYPTED, fmt=QR_FORMAT_PNG, timings=None):
+        """
+        Render a QR code to raw bytes for serving directly as an image
+        :param batch_data: dict containing supply chain information
+        :param include_logo: bool to include branding
+        :param mode: 'encrypted' or 'signed'
+        :param fmt: output format, one of QR_FORMATS
+        :param timings: optional dict filled with this call's per-stage timings (ms)
+        :return: (bytes, content type)
+        """
+        result = self.build_qr(batch_data, include_logo, mode, fmt)
+
+        start = perf_counter()
+        if fmt == QR_FORMAT_SVG:
+            data = result['svg'].encode()
+        else:
+            data = self._encode_png(result['image'], fmt)
+        result['timings']['encode'] = (perf_counter() - start) * 1000
+        result['timings']['total'] += result['timings']['encode']
+        if timings is not None:
+            timings.update(result['timings'])
+
+        return data, QR_FORMATS[fmt]
+
+    def generate_qr_data_url(self, batch_data, include_logo=False, mode=QR_MODE_ENCRYPTED, fmt=QR_FORMAT_PNG,
+                             timings=None):
         """
         Generate QR code and return as base64 data URL for web display
         :param batch_data: dict containing supply chain information
         :param include_logo: bool to include branding
+        :param mode: 'encrypted' or 'signed'
+        :param fmt: output format, one of QR_FORMATS
+        :param timings: optional dict filled with this call's per-stage timings (ms)
         :return: data URL string
         """
-        qr_image = self.generate_traceability_qr(batch_data, include_logo)
-
-        # Convert to base64
-        buffer = io.BytesIO()
-        qr_image.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        data, content_type = self.render_qr(batch_data, include_logo, mode, fmt, timings)
+        img_str = base64.b64encode(data).decode()
 
-        return f"data:image/png;base64,{img_str}"
+        return f"data:{content_type};base64,{img_str}"
 
-    def create_batch_qr(self, batch_id, farmer_id, crop_type, quantity, quality_data=None):
+    def create_batch_qr(self, batch_id, farmer_id, crop_type, quantity, quality_data=None, mode=QR_MODE_ENCRYPTED):
         """
         Create a complete batch QR code with all traceability information
         :param batch_id: unique batch identifier
@@ -107,7 +368,8 @@ class TraceabilitySystem:
         :param crop_type: type of crop
         :param quantity: quantity in kg
         :param quality_data: optional quality test results
-        :return: QR code image and encrypted data
+        :param mode: 'encrypted' or 'signed'
+        :return: QR code image and encrypted (or signed) data
         """
         batch_data = {
             'batch_id': batch_id,
@@ -120,7 +382,7 @@ class TraceabilitySystem:
             'verification_status': 'verified'
         }
 
-        qr_image = self.generate_traceability_qr(batch_data, include_logo=True)
-        encrypted_data = self.cipher.encrypt(json.dumps(batch_data).encode()).decode()
+        # The QR content and the returned token are the same ciphertext
+        result = self.build_qr(batch_data, include_logo=True, mode=mode)
 
-        return qr_image, encrypted_data, batch_data
\ No newline at end of file
+        return result['image'], result['token'], batch_data
\ No newline at end of file
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        """
+        :param maxsize: maximum number of entries before the least recently used is evicted
+        :param ttl: default time-to-live in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value, calling loader() on a miss
+        Concurrent misses for the same key wait for a single loader call
+        :param key: cache key
+        :param loader: zero-argument callable producing the value
+        :param ttl: time-to-live for the loaded value (defaults to the cache ttl), or a callable
+                    mapping the loaded value to its time-to-live
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # Another caller may have finished loading since the miss above
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > monotonic():
+                return entry[0]
+
+            event = self._loading.get(key)
+            is_leader = event is None
+            if is_leader:
+                event = self._loading[key] = threading.Event()
+
+        if not is_leader:
+            event.wait()
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            # The leading call failed; try once more ourselves
+            return self.get_or_load(key, loader, ttl)
+
+        try:
+            value = loader()
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._entries)